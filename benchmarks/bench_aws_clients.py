@@ -0,0 +1,52 @@
+"""
+Benchmark per-invocation AWS client setup with and without the client registry.
+
+Simulates the clients one lambda_handler run needs (three SSM, one Cognito,
+one S3) for several consecutive warm invocations. Without the registry every
+call creates a new client from a shared botocore session, as boto3.client
+does. No AWS calls are made.
+
+Usage: python benchmarks/bench_aws_clients.py [--invocations 10]
+"""
+
+import argparse
+import time
+
+import bench_env  # noqa: F401
+import botocore.session
+
+import lambda_function
+
+HANDLER_CLIENTS = ["ssm", "ssm", "ssm", "cognito-idp", "ssm", "ssm", "s3"]
+
+
+def uncached(session):
+    for service_name in HANDLER_CLIENTS:
+        session.create_client(service_name)
+
+
+def cached():
+    for service_name in HANDLER_CLIENTS:
+        lambda_function.get_aws_client(service_name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--invocations", type=int, default=10)
+    args = parser.parse_args()
+
+    session = botocore.session.get_session()
+    print(f"{'invocation':>10} {'uncached ms':>12} {'registry ms':>12}")
+    for invocation in range(1, args.invocations + 1):
+        start = time.perf_counter()
+        uncached(session)
+        uncached_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        cached()
+        cached_ms = (time.perf_counter() - start) * 1000
+        print(f"{invocation:>10} {uncached_ms:12.2f} {cached_ms:12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Measure the cold-start cost of the lambda: import time of lambda_function
+broken down per top-level package (from python -X importtime), the time to
+create the first AWS client, and the size of the deployment package.
+
+Every sample runs in a fresh interpreter. With --package, that interpreter
+sees only the standard library and the package directory, as built by the
+workflow:
+
+    pip install -r lambda/requirements.txt -t lambda/package
+    cp lambda/lambda_function.py lambda/package/
+    python -m compileall -q --invalidation-mode checked-hash lambda/package
+
+Without --package, lambda/ and the current environment are used.
+--max-init-ms makes the script exit with status 1 when the median import plus
+first-client time exceeds an absolute budget.
+
+--baseline-package points at a package built the same way from the base
+revision. Its samples alternate with those of --package, and
+--max-regression fails the run when the median ratio between each sample and
+the baseline sample taken right after it exceeds 1 + the given fraction.
+CI uses this, because absolute times differ between shared runners while
+the ratio stays stable.
+
+Usage: python benchmarks/bench_cold_start.py [--package lambda/package]
+    [--baseline-package base/lambda/package --max-regression 0.2] [--runs 9]
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import zipfile
+
+import bench_env
+
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+MARKER = "bench-cold-start-phase"
+
+# Runs in the fresh interpreter; phase markers go to stderr between the
+# -X importtime lines so each import can be attributed to its phase
+CHILD = f"""
+import sys, time
+sys.stderr.write("{MARKER} import\\n")
+start = time.perf_counter()
+import lambda_function
+imported = time.perf_counter()
+sys.stderr.write("{MARKER} client\\n")
+# Older revisions, such as a baseline, create their clients as they did then
+create_client = getattr(lambda_function, "get_aws_client", None)
+if create_client is None and hasattr(lambda_function, "boto3"):
+    create_client = lambda_function.boto3.client
+if create_client is None:
+    import botocore.session
+    create_client = botocore.session.get_session().create_client
+create_client("s3")
+done = time.perf_counter()
+print((imported - start) * 1000, (done - imported) * 1000)
+"""
+
+
+def sample(package):
+    """
+    Run one cold start and return (import ms, client ms, {(phase, package): self ms}).
+    """
+    command = [sys.executable, "-X", "importtime"]
+    env = dict(os.environ)
+    if package:
+        # No site-packages: only what the zip ships
+        command.append("-S")
+        env["PYTHONPATH"] = os.path.abspath(package)
+    else:
+        env["PYTHONPATH"] = bench_env.LAMBDA_DIR
+    result = subprocess.run(
+        command + ["-c", CHILD], env=env, capture_output=True, text=True, check=True
+    )
+    import_ms, client_ms = map(float, result.stdout.split())
+
+    phase = None
+    self_ms = {}
+    for line in result.stderr.splitlines():
+        if line.startswith(MARKER):
+            phase = line.split()[1]
+            continue
+        match = IMPORT_LINE.match(line)
+        if phase and match:
+            name = match.group(4).split(".")[0]
+            if name in sys.stdlib_module_names or name.startswith("_"):
+                name = "(stdlib)"
+            key = (phase, name)
+            self_ms[key] = self_ms.get(key, 0) + int(match.group(1)) / 1000
+    return import_ms, client_ms, self_ms
+
+
+def package_size(package):
+    """
+    Return (unpacked bytes, zipped bytes) of the package directory.
+    """
+    unpacked = 0
+    with tempfile.TemporaryFile() as archive:
+        with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zf:
+            for root, _, files in os.walk(package):
+                for name in files:
+                    path = os.path.join(root, name)
+                    unpacked += os.path.getsize(path)
+                    zf.write(path, os.path.relpath(path, package))
+        return unpacked, archive.tell()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--package", help="unzipped deployment package directory")
+    parser.add_argument("--runs", type=int, default=9)
+    parser.add_argument("--top", type=int, default=12)
+    parser.add_argument(
+        "--max-init-ms",
+        type=float,
+        help="fail if the median import + first client time exceeds this",
+    )
+    parser.add_argument(
+        "--baseline-package", help="package built from the base revision"
+    )
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        help="fail if init is this fraction slower than the baseline, e.g. 0.2",
+    )
+    args = parser.parse_args()
+    if args.baseline_package and not args.package:
+        parser.error("--baseline-package needs --package")
+    if args.max_regression is not None and not args.baseline_package:
+        parser.error("--max-regression needs --baseline-package")
+
+    # Fill the OS file cache so the first sample is not an outlier
+    sample(args.package)
+    if args.baseline_package:
+        sample(args.baseline_package)
+    samples = []
+    baseline_samples = []
+    for _ in range(args.runs):
+        samples.append(sample(args.package))
+        if args.baseline_package:
+            baseline_samples.append(sample(args.baseline_package))
+    import_ms = statistics.median(s[0] for s in samples)
+    client_ms = statistics.median(s[1] for s in samples)
+    init_ms = statistics.median(s[0] + s[1] for s in samples)
+
+    packages = {}
+    for _, _, self_ms in samples:
+        for key, ms in self_ms.items():
+            packages.setdefault(key[1], {}).setdefault(key[0], []).append(ms)
+
+    def median_ms(phases, phase):
+        # Absent from a sample counts as 0
+        values = phases.get(phase, [])
+        return statistics.median(values + [0] * (len(samples) - len(values)))
+
+    rows = sorted(
+        (
+            (median_ms(phases, "import"), median_ms(phases, "client"), name)
+            for name, phases in packages.items()
+        ),
+        key=lambda row: -(row[0] + row[1]),
+    )
+    print(f"{'package':>20} {'import ms':>10} {'client ms':>10}")
+    for imported, client, name in rows[: args.top]:
+        print(f"{name:>20} {imported:10.1f} {client:10.1f}")
+    print(
+        f"\nmedian of {args.runs}: import {import_ms:.1f} ms, "
+        f"first client {client_ms:.1f} ms, init {init_ms:.1f} ms"
+    )
+    if args.package:
+        unpacked, zipped = package_size(args.package)
+        print(
+            f"package: {unpacked / 2**20:.1f} MiB unpacked, "
+            f"{zipped / 2**20:.1f} MiB zipped"
+        )
+
+    failed = False
+    if args.baseline_package:
+        baseline_ms = statistics.median(s[0] + s[1] for s in baseline_samples)
+        # Pairing each sample with the next baseline sample cancels out load
+        # on the runner that changes during the job
+        ratio = statistics.median(
+            (s[0] + s[1]) / (b[0] + b[1]) for s, b in zip(samples, baseline_samples)
+        )
+        print(f"baseline: init {baseline_ms:.1f} ms, ratio {ratio:.2f}")
+        if args.max_regression is not None and ratio > 1 + args.max_regression:
+            print(
+                f"Cold init is {ratio:.2f}x the baseline, more than the allowed "
+                f"{1 + args.max_regression:.2f}x",
+                file=sys.stderr,
+            )
+            failed = True
+
+    if args.max_init_ms is not None and init_ms > args.max_init_ms:
+        print(
+            f"Cold init {init_ms:.1f} ms exceeds the {args.max_init_ms:.0f} ms budget",
+            file=sys.stderr,
+        )
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Run the full lambda_handler offline at several component counts and report
+wall time, probes per second and peak RSS.
+
+SSM, Cognito and S3 are faked locally (fake_ssm.py, fake_aws.py) and every
+component points at a ServiceFarm endpoint with the given latency, error and
+hang distributions. Each tier runs in a fresh Python process, so its first
+run is a cold start and its peak RSS is its own. The fake S3 keeps uploaded
+objects in memory, which is included in the RSS.
+
+Lambda settings such as PROBE_MODE or REPORT_STREAMING are read from the
+environment as usual, e.g.
+
+    PROBE_MODE=asyncio python benchmarks/bench_end_to_end.py --counts 100 1000
+
+Usage: python benchmarks/bench_end_to_end.py [--counts 100 1000 3000] [--runs 3]
+"""
+
+import argparse
+import contextlib
+import gzip
+import io
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+import bench_env  # noqa: F401
+import fake_aws
+from fake_ssm import FakeSSMServer
+from service_farm import ServiceFarm
+from stub_http import make_service_infos
+
+
+def peak_rss_mib():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def latest_statuses(s3, bucket_name):
+    body, _ = s3.objects[(bucket_name, "health_check_latest.json")]
+    if body[:2] == b"\x1f\x8b":
+        body = gzip.decompress(body)
+    statuses = {}
+    for entry in json.loads(body)["services"]:
+        status = entry["healthChecks"][0]["status"]
+        statuses[status] = statuses.get(status, 0) + 1
+    return statuses
+
+
+def run_tier(runs):
+    """
+    Child process: run lambda_handler runs times and print one JSON result line.
+    """
+    import lambda_function
+
+    _, s3 = fake_aws.install(lambda_function)
+    lambda_function.log_handler.setStream(open(os.devnull, "w"))
+    bucket_name = f"unity-{os.environ['PROJECT']}-{os.environ['VENUE']}-bucket"
+    rss_before = peak_rss_mib()
+    timings = []
+    # Metrics are printed as EMF lines
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(runs):
+            start = time.perf_counter()
+            lambda_function.lambda_handler({}, None)
+            timings.append(time.perf_counter() - start)
+    print(
+        json.dumps(
+            {
+                "timings": timings,
+                "statuses": latest_statuses(s3, bucket_name),
+                "rssImportMiB": rss_before,
+                "rssPeakMiB": peak_rss_mib(),
+            }
+        )
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--counts", type=int, nargs="+", default=[100, 1000, 3000])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--servers", type=int, default=4)
+    parser.add_argument(
+        "--latency", type=float, default=0.02, help="median endpoint latency (s)"
+    )
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--hang-rate", type=float, default=0.002)
+    parser.add_argument(
+        "--read-timeout",
+        type=float,
+        default=2.0,
+        help="PROBE_READ_TIMEOUT_SECONDS, how long probes wait for hanging endpoints",
+    )
+    parser.add_argument("--ssm-latency", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_tier(args.runs)
+        return
+
+    farm = [
+        ServiceFarm(
+            args.latency,
+            args.latency_sigma,
+            args.error_rate,
+            args.hang_rate,
+            seed=args.seed + i,
+        ).start()
+        for i in range(args.servers)
+    ]
+    print(
+        f"{'components':>10} {'cold s':>8} {'warm s':>8} {'probes/s':>9} "
+        f"{'import MiB':>11} {'peak MiB':>9}  statuses"
+    )
+    try:
+        for count in args.counts:
+            parameters = fake_aws.shared_parameters()
+            # make_service_infos registers components under /unity/bench/dev/
+            parameters.update(make_service_infos(farm, count))
+            ssm = FakeSSMServer(parameters, args.ssm_latency).start()
+            env = {
+                **os.environ,
+                "AWS_ENDPOINT_URL_SSM": ssm.endpoint_url,
+                "PROJECT": "bench",
+                "VENUE": "dev",
+                "PROBE_READ_TIMEOUT_SECONDS": str(args.read_timeout),
+            }
+            try:
+                child = subprocess.run(
+                    [sys.executable, __file__, "--child", "--runs", str(args.runs)],
+                    env=env,
+                    stdout=subprocess.PIPE,
+                    check=True,
+                )
+            finally:
+                ssm.stop()
+            result = json.loads(child.stdout.decode().splitlines()[-1])
+            timings = result["timings"]
+            warm = statistics.median(timings[1:]) if len(timings) > 1 else timings[0]
+            statuses = " ".join(
+                f"{status}={n}" for status, n in sorted(result["statuses"].items())
+            )
+            print(
+                f"{count:>10} {timings[0]:8.2f} {warm:8.2f} {count / warm:9.0f} "
+                f"{result['rssImportMiB']:11.1f} {result['rssPeakMiB']:9.1f}  {statuses}"
+            )
+    finally:
+        for server in farm:
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
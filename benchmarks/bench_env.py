@@ -0,0 +1,16 @@
+"""
+Shared setup for the benchmarks: makes lambda/lambda_function.py importable
+and gives botocore a region and dummy credentials so it never reaches real AWS
+credentials while talking to local fakes.
+"""
+
+import os
+import sys
+
+LAMBDA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lambda")
+if LAMBDA_DIR not in sys.path:
+    sys.path.insert(0, LAMBDA_DIR)
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-west-2")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "benchmark")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "benchmark")
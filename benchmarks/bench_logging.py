@@ -0,0 +1,113 @@
+"""
+Measure log volume and handler time of a full lambda_handler run at each
+LOG_LEVEL, with SSM, Cognito, S3 and the health endpoints faked locally.
+
+DEBUG logs the same dumps (Cognito parameters, every registration and the
+whole health report) that the handler used to print on every run; INFO logs
+only counts and summaries.
+
+Usage: python benchmarks/bench_logging.py [--components 500] [--runs 5]
+"""
+
+import argparse
+import contextlib
+import logging
+import os
+import statistics
+import time
+
+import bench_env  # noqa: F401
+import fake_aws
+from fake_ssm import FakeSSMServer
+from stub_http import StubServer, make_service_infos
+
+import lambda_function
+
+
+class CountingStream:
+    def __init__(self):
+        self.bytes = 0
+        self.lines = 0
+
+    def write(self, text):
+        self.bytes += len(text.encode())
+        self.lines += text.count("\n")
+
+    def flush(self):
+        pass
+
+
+def run(level, runs):
+    lambda_function.logger.setLevel(level)
+    stream = CountingStream()
+    handler = lambda_function.log_handler
+    previous = handler.setStream(stream)
+    handle = handler.handle
+    logging_seconds = 0.0
+
+    def timed_handle(record):
+        # Formatting, redaction and writing happen here, only for emitted records
+        nonlocal logging_seconds
+        start = time.perf_counter()
+        try:
+            return handle(record)
+        finally:
+            logging_seconds += time.perf_counter() - start
+
+    handler.handle = timed_handle
+    timings = []
+    try:
+        # Metrics are printed as EMF lines; keep them out of the count
+        with contextlib.redirect_stdout(CountingStream()):
+            for _ in range(runs):
+                start = time.perf_counter()
+                lambda_function.lambda_handler({}, None)
+                timings.append(time.perf_counter() - start)
+    finally:
+        del handler.handle
+        handler.setStream(previous)
+    return (
+        stream.bytes / runs,
+        stream.lines / runs,
+        logging_seconds / runs,
+        statistics.median(timings),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--components", type=int, default=500)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    servers = [StubServer(args.latency).start() for _ in range(4)]
+    parameters = fake_aws.shared_parameters()
+    # make_service_infos registers components under /unity/bench/dev/
+    parameters.update(make_service_infos(servers, args.components))
+    ssm = FakeSSMServer(parameters).start()
+    os.environ["AWS_ENDPOINT_URL_SSM"] = ssm.endpoint_url
+    os.environ["PROJECT"] = "bench"
+    os.environ["VENUE"] = "dev"
+    fake_aws.install(lambda_function)
+    try:
+        # Warm up clients and connection pools
+        run(logging.WARNING, 1)
+        print(
+            f"{'level':>8} {'KiB/run':>9} {'lines/run':>10} "
+            f"{'logging ms':>11} {'handler s':>10}"
+        )
+        for level in ("DEBUG", "INFO", "WARNING"):
+            size, lines, logging_s, elapsed = run(level, args.runs)
+            print(
+                f"{level:>8} {size / 1024:9.1f} {lines:10.0f} "
+                f"{logging_s * 1000:11.1f} {elapsed:10.3f}"
+            )
+    finally:
+        ssm.stop()
+        for server in servers:
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Benchmark check_service_health (the StreamingProber engine the handler uses)
+and the asyncio probe mode against local stub HTTP servers.
+
+Usage: python benchmarks/bench_probe_concurrency.py [--latency 0.05] [--workers 32]
+"""
+
+import argparse
+import asyncio
+import time
+
+import bench_env  # noqa: F401
+from stub_http import StubServer, make_service_infos
+
+import lambda_function
+
+
+def run(service_infos, workers):
+    start = time.perf_counter()
+    if workers == "asyncio":
+        health_status = asyncio.run(
+            lambda_function.check_service_health_async(service_infos, "bench-token")
+        )
+    else:
+        health_status = lambda_function.check_service_health(
+            service_infos, "bench-token", max_workers=workers
+        )
+    elapsed = time.perf_counter() - start
+    assert len(health_status["services"]) == len(service_infos)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument(
+        "--workers", type=int, default=lambda_function.PROBE_MAX_WORKERS
+    )
+    parser.add_argument("--servers", type=int, default=4)
+    parser.add_argument("--counts", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument(
+        "--skip-sequential-above",
+        type=int,
+        default=100,
+        help="Only run the sequential baseline up to this many components",
+    )
+    args = parser.parse_args()
+
+    servers = [StubServer(args.latency).start() for _ in range(args.servers)]
+    try:
+        print(
+            f"{'components':>10} {'sequential s':>13} {'pooled s':>10} "
+            f"{'speedup':>8} {'asyncio s':>10}"
+        )
+        for count in args.counts:
+            service_infos = make_service_infos(servers, count)
+            pooled = run(service_infos, args.workers)
+            async_elapsed = run(service_infos, "asyncio")
+            if count <= args.skip_sequential_above:
+                sequential = run(service_infos, 1)
+                speedup = f"{sequential / pooled:7.1f}x"
+                sequential = f"{sequential:13.2f}"
+            else:
+                sequential = f"{'skipped':>13}"
+                speedup = f"{'-':>8}"
+            print(
+                f"{count:>10} {sequential} {pooled:10.2f} {speedup} {async_elapsed:10.2f}"
+            )
+    finally:
+        for server in servers:
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
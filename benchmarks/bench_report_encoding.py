@@ -0,0 +1,92 @@
+"""
+Compare size and encoding time of a health report in each REPORT_COMPACT,
+REPORT_GZIP and REPORT_SERIALIZER combination.
+
+The report is synthetic (no probing), so only serialisation and compression
+are timed. orjson rows are skipped when orjson is not installed.
+
+Usage: python benchmarks/bench_report_encoding.py [--components 1000]
+"""
+
+import argparse
+import datetime
+import json
+import time
+
+import bench_env  # noqa: F401
+
+import lambda_function
+
+
+def make_report(count):
+    services = []
+    for i in range(count):
+        info = lambda_function.parse_service_info(
+            json.dumps(
+                {
+                    "componentName": f"svc-{i}",
+                    "componentCategory": "bench",
+                    "componentType": "service",
+                    "description": f"benchmark component {i}",
+                    "healthCheckUrl": f"https://svc-{i}.example.com/health",
+                    "landingPageUrl": f"https://svc-{i}.example.com/",
+                }
+            )
+        )
+        services.append(
+            lambda_function.build_health_entry(
+                f"/unity/bench/dev/component/svc-{i}",
+                info,
+                "HEALTHY" if i % 10 else "UNHEALTHY",
+                200 if i % 10 else 503,
+                datetime.datetime.now().isoformat(),
+                {"total": 42.125 + i % 17, "connect": 3.5, "tls": 9.25, "ttfb": 20.0},
+            )
+        )
+    return {"services": services}
+
+
+def measure(report, repeat, **options):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body, _ = lambda_function.encode_report(report, **options)
+        best = min(best, time.perf_counter() - start)
+    return len(body), best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--components", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    report = make_report(args.components)
+    variants = [
+        ("indent (default)", dict(compact=False, compress=False)),
+        ("indent + gzip", dict(compact=False, compress=True)),
+        ("compact json", dict(compact=True, compress=False, serializer="json")),
+        ("compact json + gzip", dict(compact=True, compress=True, serializer="json")),
+    ]
+    if lambda_function.orjson is not None:
+        variants += [
+            ("compact orjson", dict(compact=True, compress=False, serializer="auto")),
+            (
+                "compact orjson + gzip",
+                dict(compact=True, compress=True, serializer="auto"),
+            ),
+        ]
+
+    baseline = None
+    print(f"{'encoding':>22} {'KiB':>8} {'ratio':>6} {'ms':>8}")
+    for name, options in variants:
+        size, elapsed = measure(report, args.repeat, **options)
+        baseline = baseline or size
+        print(
+            f"{name:>22} {size / 1024:8.1f} {size / baseline:6.2f} "
+            f"{elapsed * 1000:8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Measure peak Python heap (tracemalloc) of a warm lambda_handler run,
+buffered as the lambda does by default versus streamed with
+REPORT_STREAMING.
+
+SSM is faked over HTTP (fake_ssm.py), Cognito and S3 in process
+(fake_aws.py), and every component points at a local stub endpoint. The
+fakes run in this process, so their per-request allocations are included in
+the peak. The fake S3 reads uploaded bodies in chunks and drops them, as a
+real upload would, rather than keeping the report in memory.
+
+Latency histograms, uptime rollups and check windows keep per-component
+state across runs by design and are disabled unless --with-state is given,
+so the figures show what the report itself costs.
+
+Usage: python benchmarks/bench_report_memory.py [--counts 100 1000 3000] [--with-state]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+import bench_env  # noqa: F401
+import fake_aws
+from fake_ssm import FakeSSMServer
+from stub_http import StubServer, make_service_infos
+
+
+def measure(lambda_function, streaming):
+    lambda_function.REPORT_STREAMING = streaming
+    with contextlib.redirect_stdout(io.StringIO()):
+        # Warm up clients, sessions and connection pools first
+        lambda_function.lambda_handler({}, None)
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        lambda_function.lambda_handler({}, None)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+        tracemalloc.stop()
+    return peak, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.005)
+    parser.add_argument("--counts", type=int, nargs="+", default=[100, 1000, 3000])
+    parser.add_argument("--with-state", action="store_true")
+    args = parser.parse_args()
+
+    if not args.with_state:
+        os.environ["LATENCY_HISTOGRAMS"] = "false"
+        os.environ["UPTIME_ROLLUPS"] = "false"
+        os.environ["CHECK_WINDOW_SIZE"] = "1"
+    os.environ["PROJECT"] = "bench"
+    os.environ["VENUE"] = "dev"
+
+    servers = [StubServer(args.latency).start() for _ in range(4)]
+    ssm = FakeSSMServer({}).start()
+    os.environ["AWS_ENDPOINT_URL_SSM"] = ssm.endpoint_url
+    import lambda_function
+
+    fake_aws.install(lambda_function, s3=fake_aws.FakeS3Client(discard_bodies=True))
+    lambda_function.log_handler.setStream(open(os.devnull, "w"))
+    try:
+        print(
+            f"{'components':>10} {'buffered MiB':>13} {'streamed MiB':>13} "
+            f"{'buffered s':>11} {'streamed s':>11}"
+        )
+        for count in args.counts:
+            ssm.parameters = fake_aws.shared_parameters()
+            # make_service_infos registers components under /unity/bench/dev/
+            ssm.parameters.update(make_service_infos(servers, count))
+            buffered_peak, buffered_s = measure(lambda_function, False)
+            streamed_peak, streamed_s = measure(lambda_function, True)
+            print(
+                f"{count:>10} {buffered_peak / 2**20:13.2f} "
+                f"{streamed_peak / 2**20:13.2f} {buffered_s:11.2f} {streamed_s:11.2f}"
+            )
+            sys.stdout.flush()
+    finally:
+        ssm.stop()
+        for server in servers:
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
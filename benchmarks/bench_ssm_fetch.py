@@ -0,0 +1,58 @@
+"""
+Benchmark get_ssm_parameter_value against a local fake SSM endpoint,
+fetching the 10-name chunks sequentially and concurrently.
+
+Usage: python benchmarks/bench_ssm_fetch.py [--latency 0.03] [--throttle-rate 0.05]
+"""
+
+import argparse
+import os
+import time
+
+import bench_env  # noqa: F401
+from fake_ssm import FakeSSMServer
+
+import lambda_function
+
+
+def run(names, workers):
+    start = time.perf_counter()
+    values = lambda_function.get_ssm_parameter_value(names, max_workers=workers)
+    elapsed = time.perf_counter() - start
+    assert len(values) == len(names), f"fetched {len(values)} of {len(names)}"
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.03)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--workers", type=int, default=lambda_function.SSM_FETCH_MAX_WORKERS
+    )
+    parser.add_argument("--counts", type=int, nargs="+", default=[100, 500, 2000])
+    args = parser.parse_args()
+
+    parameters = {
+        f"/unity/bench/dev/component/svc-{i}": "{}" for i in range(max(args.counts))
+    }
+    server = FakeSSMServer(parameters, args.latency, args.throttle_rate).start()
+    os.environ["AWS_ENDPOINT_URL_SSM"] = server.endpoint_url
+    try:
+        print(
+            f"{'parameters':>10} {'sequential s':>13} {'parallel s':>11} {'speedup':>8}"
+        )
+        for count in args.counts:
+            names = list(parameters)[:count]
+            sequential = run(names, 1)
+            parallel = run(names, args.workers)
+            print(
+                f"{count:>10} {sequential:13.2f} {parallel:11.2f} "
+                f"{sequential / parallel:7.1f}x"
+            )
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
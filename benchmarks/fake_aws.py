@@ -0,0 +1,125 @@
+"""
+In-process fakes of the Cognito and S3 clients for benchmarks that run the
+whole lambda_handler. SSM is faked over HTTP by fake_ssm.py instead.
+
+install() puts them in lambda_function's client registry, so
+get_aws_client returns them instead of real clients.
+"""
+
+import io
+import os
+import threading
+
+import botocore.exceptions
+
+
+class FakeCognitoClient:
+    def __init__(self, expires_in=3600):
+        self.expires_in = expires_in
+        self.calls = 0
+        self.flows = []
+        # Error codes raised by the next calls of each auth flow, e.g.
+        # {"REFRESH_TOKEN_AUTH": ["NotAuthorizedException"]}
+        self.errors = {}
+
+    def initiate_auth(self, AuthFlow, AuthParameters, ClientId):
+        self.calls += 1
+        self.flows.append(AuthFlow)
+        errors = self.errors.get(AuthFlow)
+        if errors:
+            code = errors.pop(0)
+            raise botocore.exceptions.ClientError(
+                {"Error": {"Code": code, "Message": code}}, "InitiateAuth"
+            )
+        result = {
+            "AccessToken": f"benchmark-access-token-{self.calls}",
+            "ExpiresIn": self.expires_in,
+        }
+        if AuthFlow == "USER_PASSWORD_AUTH":
+            result["RefreshToken"] = "benchmark-refresh-token"
+        return {"AuthenticationResult": result}
+
+
+class FakeS3Client:
+    """
+    With discard_bodies, uploaded bodies are read in chunks and dropped, so a
+    memory benchmark does not count the reports this fake would keep; objects
+    then read back empty.
+    """
+
+    def __init__(self, discard_bodies=False):
+        self.discard_bodies = discard_bodies
+        self.objects = {}
+        self.calls = {}
+        # Error codes raised by the next calls of each action, e.g.
+        # {"GetObject": ["SlowDown"]}
+        self.errors = {}
+        self.lock = threading.Lock()
+
+    def _count(self, action):
+        with self.lock:
+            self.calls[action] = self.calls.get(action, 0) + 1
+            errors = self.errors.get(action)
+            code = errors.pop(0) if errors else None
+        if code:
+            raise botocore.exceptions.ClientError(
+                {"Error": {"Code": code, "Message": code}}, action
+            )
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self._count("PutObject")
+        if self.discard_bodies:
+            if hasattr(Body, "read"):
+                while Body.read(64 * 1024):
+                    pass
+            Body = b""
+        elif hasattr(Body, "read"):
+            Body = Body.read()
+        if isinstance(Body, str):
+            Body = Body.encode()
+        with self.lock:
+            self.objects[(Bucket, Key)] = (Body, kwargs)
+        return {}
+
+    def copy_object(self, Bucket, Key, CopySource, **kwargs):
+        self._count("CopyObject")
+        with self.lock:
+            body, metadata = self.objects[(CopySource["Bucket"], CopySource["Key"])]
+            self.objects[(Bucket, Key)] = (body, {**metadata, **kwargs})
+        return {}
+
+    def get_object(self, Bucket, Key, **kwargs):
+        self._count("GetObject")
+        with self.lock:
+            stored = self.objects.get((Bucket, Key))
+        if stored is None:
+            raise botocore.exceptions.ClientError(
+                {"Error": {"Code": "NoSuchKey", "Message": Key}}, "GetObject"
+            )
+        body, metadata = stored
+        return {"Body": io.BytesIO(body), "ContentLength": len(body), **metadata}
+
+
+def install(lambda_function, cognito=None, s3=None):
+    """
+    Register fake Cognito and S3 clients with lambda_function and return them.
+    """
+    cognito = cognito or FakeCognitoClient()
+    s3 = s3 or FakeS3Client()
+    # Same key get_aws_client uses for the default region
+    region = os.environ.get("AWS_REGION") or os.environ.get("AWS_DEFAULT_REGION")
+    lambda_function._aws_clients[("cognito-idp", region)] = cognito
+    lambda_function._aws_clients[("s3", region)] = s3
+    return cognito, s3
+
+
+def shared_parameters():
+    """
+    SSM parameters the lambda reads from shared services besides components.
+    """
+    return {
+        "/unity/shared-services/aws/account": "123456789012",
+        "/unity/shared-services/cognito/monitoring-username": "benchmark",
+        "/unity/shared-services/cognito/monitoring-password": "benchmark-password",
+        "/unity/shared-services/dapa/client-id": "benchmark-client",
+    }
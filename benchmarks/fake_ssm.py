@@ -0,0 +1,114 @@
+"""
+Local fake of the SSM JSON API for benchmarks.
+
+Point botocore at it with AWS_ENDPOINT_URL_SSM. Supports the calls the lambda
+makes: GetParameter, GetParameters, DescribeParameters and
+GetParametersByPath.
+"""
+
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeSSMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        request = json.loads(body or b"{}")
+        action = self.headers.get("X-Amz-Target", "").rpartition(".")[2]
+        with server.lock:
+            server.calls[action] = server.calls.get(action, 0) + 1
+
+        time.sleep(server.latency)
+        if random.random() < server.throttle_rate:
+            self._reply(
+                400, {"__type": "ThrottlingException", "message": "Rate exceeded"}
+            )
+            return
+
+        handler = getattr(self, f"_{action}", None)
+        if handler is None:
+            self._reply(400, {"__type": "InvalidAction", "message": action})
+            return
+        self._reply(200, handler(request))
+
+    def _param(self, name):
+        value = self.server.parameters[name]
+        return {"Name": name, "Type": "String", "Value": value, "Version": 1}
+
+    @staticmethod
+    def _plain_name(name):
+        # Shared parameters are requested by ARN
+        return name.partition(":parameter")[2] or name
+
+    def _GetParameter(self, request):
+        name = self._plain_name(request["Name"])
+        return {"Parameter": self._param(name)}
+
+    def _GetParameters(self, request):
+        found, invalid = [], []
+        for name in request["Names"]:
+            if self._plain_name(name) in self.server.parameters:
+                found.append(self._param(self._plain_name(name)))
+            else:
+                invalid.append(name)
+        return {"Parameters": found, "InvalidParameters": invalid}
+
+    def _page(self, names, request, default_size, item):
+        start = int(request.get("NextToken") or 0)
+        size = request.get("MaxResults", default_size)
+        response = {"Parameters": [item(name) for name in names[start : start + size]]}
+        if start + size < len(names):
+            response["NextToken"] = str(start + size)
+        return response
+
+    def _DescribeParameters(self, request):
+        prefix = request["ParameterFilters"][0]["Values"][0]
+        names = sorted(n for n in self.server.parameters if n.startswith(prefix))
+        return self._page(names, request, 50, lambda name: {"Name": name})
+
+    def _GetParametersByPath(self, request):
+        path = request["Path"].rstrip("/") + "/"
+        names = sorted(n for n in self.server.parameters if n.startswith(path))
+        return self._page(names, request, 10, self._param)
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/x-amz-json-1.1")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeSSMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, parameters, latency=0.0, throttle_rate=0.0):
+        super().__init__(("127.0.0.1", 0), FakeSSMHandler)
+        self.parameters = parameters
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.calls = {}
+        self.lock = threading.Lock()
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def endpoint_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
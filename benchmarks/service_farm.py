@@ -0,0 +1,114 @@
+"""
+In-process farm of component health endpoints with configurable behaviour,
+for benchmarks that need more than the fixed-latency stubs in stub_http.py.
+
+Every request independently draws its outcome: it hangs with probability
+hang_rate, otherwise it waits a log-normally distributed latency and answers
+503 with probability error_rate, else 200.
+"""
+
+import math
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FarmHealthHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self._respond(send_body=True)
+
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+    def _respond(self, send_body):
+        server = self.server
+        outcome, latency = server.draw()
+        server.count(outcome)
+        if outcome == "hang":
+            # Held until the probe gives up or the farm is stopped
+            server.stopping.wait(server.hang_seconds)
+            self.close_connection = True
+            return
+        server.stopping.wait(latency)
+        status = 503 if outcome == "error" else 200
+        body = b'{"status": "%s"}' % (b"error" if outcome == "error" else b"ok")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ServiceFarm(ThreadingHTTPServer):
+    """
+    Health endpoint server drawing each response from latency, error and hang distributions.
+
+    Parameters:
+    - latency (float): Median response latency in seconds.
+    - latency_sigma (float): Sigma of the log-normal latency; 0 always waits latency.
+    - error_rate (float): Probability of answering 503.
+    - hang_rate (float): Probability of never answering.
+    - hang_seconds (float): How long a hanging request is held open at most.
+    - seed (int): Seed for the outcome draws.
+    """
+
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(
+        self,
+        latency=0.0,
+        latency_sigma=0.0,
+        error_rate=0.0,
+        hang_rate=0.0,
+        hang_seconds=300.0,
+        seed=None,
+    ):
+        super().__init__(("127.0.0.1", 0), FarmHealthHandler)
+        self.latency = latency
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.hang_rate = hang_rate
+        self.hang_seconds = hang_seconds
+        self.random = random.Random(seed)
+        self.stopping = threading.Event()
+        self.outcomes = {}
+        self.lock = threading.Lock()
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    def draw(self):
+        with self.lock:
+            roll = self.random.random()
+            if roll < self.hang_rate:
+                return "hang", None
+            latency = self.latency
+            if latency > 0 and self.latency_sigma > 0:
+                latency = self.random.lognormvariate(
+                    math.log(latency), self.latency_sigma
+                )
+            if roll < self.hang_rate + self.error_rate:
+                return "error", latency
+            return "ok", latency
+
+    def count(self, outcome):
+        with self.lock:
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.stopping.set()
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,94 @@
+"""
+Local stub HTTP servers used by the benchmarks in this directory.
+
+Each server answers every GET and HEAD with a 200 after a fixed delay, standing in for
+a component health endpoint. A larger body can be sent in chunks with a delay
+between them, and the requests received are counted by method.
+"""
+
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubHealthHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self._respond(send_body=True)
+
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+    def _respond(self, send_body):
+        self.server.methods[self.command] += 1
+        time.sleep(self.server.latency)
+        body = self.server.body
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if not send_body:
+            return
+        try:
+            for start in range(0, len(body), self.server.chunk_size):
+                if start:
+                    time.sleep(self.server.chunk_delay)
+                self.wfile.write(body[start : start + self.server.chunk_size])
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stopped reading, as STREAM probes do
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(
+        self, latency, body=b'{"status": "ok"}', chunk_size=None, chunk_delay=0
+    ):
+        super().__init__(("127.0.0.1", 0), StubHealthHandler)
+        self.latency = latency
+        self.body = body
+        self.chunk_size = chunk_size or len(body)
+        self.chunk_delay = chunk_delay
+        self.methods = Counter()
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def make_service_infos(servers, count):
+    """
+    Build a service_infos dict as returned by get_ssm_parameter_value,
+    spreading count components round-robin over the given servers.
+    """
+    service_infos = {}
+    for i in range(count):
+        server = servers[i % len(servers)]
+        service_infos[f"/unity/bench/dev/component/svc-{i}"] = json.dumps(
+            {
+                "componentName": f"svc-{i}",
+                "componentCategory": "bench",
+                "componentType": "service",
+                "description": "benchmark stub",
+                "healthCheckUrl": f"{server.base_url}/health/{i}",
+                "landingPageUrl": f"{server.base_url}/",
+            }
+        )
+    return service_infos
@@ -1,33 +1,725 @@
-import boto3
 import os
+import asyncio
 import botocore
+import botocore.exceptions
 import sys
 import requests
+import threading
+import time
+import random
+import tempfile
+import textwrap
+from collections import deque
+from contextlib import contextmanager
 import datetime
 import json
+import gzip
+import hashlib
+import logging
+import re
+import ssl
+import socket
+from urllib.parse import urljoin, urlsplit
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
 
+try:
+    # Optional faster serializer for compact reports
+    import orjson
+except ImportError:
+    orjson = None
 
-def get_ssm_parameter_value(parameter_names, shared=False):
+# Maximum number of health checks in flight at once
+PROBE_MAX_WORKERS = int(os.environ.get("PROBE_MAX_WORKERS", "32"))
+
+# Per-probe connect and read timeouts
+PROBE_CONNECT_TIMEOUT_SECONDS = float(
+    os.environ.get("PROBE_CONNECT_TIMEOUT_SECONDS", "5")
+)
+PROBE_READ_TIMEOUT_SECONDS = float(os.environ.get("PROBE_READ_TIMEOUT_SECONDS", "30"))
+
+# Probe methods a component can request with "probeMethod" in its SSM
+# registration: GET downloads the whole response, HEAD skips the body, STREAM
+# reads at most "probeMaxBytes" of the body and TCP only opens a connection
+PROBE_METHODS = ("GET", "HEAD", "STREAM", "TCP")
+PROBE_STREAM_MAX_BYTES = int(os.environ.get("PROBE_STREAM_MAX_BYTES", "1024"))
+
+# Probe each unique health check URL (with the same probe method and
+# credentials) once per run and share the outcome between its registrations
+PROBE_COALESCING = os.environ.get("PROBE_COALESCING", "true").lower() == "true"
+
+# Time kept back from the Lambda deadline for serialising and uploading the
+# report. Probes still running past that point are recorded as TIMEOUT, and
+# the run stops waiting for component discovery and state reads.
+DEADLINE_RESERVE_SECONDS = float(os.environ.get("DEADLINE_RESERVE_SECONDS", "20"))
+
+# Keep-alive pool sizing for the shared HTTP session: number of hosts to keep
+# pools for, and connections kept per host
+HTTP_POOL_CONNECTIONS = int(os.environ.get("HTTP_POOL_CONNECTIONS", "50"))
+HTTP_POOL_MAXSIZE = int(os.environ.get("HTTP_POOL_MAXSIZE", str(PROBE_MAX_WORKERS)))
+
+# Connection caps for the asyncio probe mode
+ASYNC_PROBE_MAX_CONNECTIONS = int(os.environ.get("ASYNC_PROBE_MAX_CONNECTIONS", "200"))
+ASYNC_PROBE_MAX_PER_HOST = int(os.environ.get("ASYNC_PROBE_MAX_PER_HOST", "20"))
+
+# How long SSM component registrations are reused across warm invocations.
+# 0 disables the cache. SSM_CACHE_FILE optionally persists it, e.g. under /tmp.
+SSM_CACHE_TTL_SECONDS = float(os.environ.get("SSM_CACHE_TTL_SECONDS", "0"))
+SSM_CACHE_FILE = os.environ.get("SSM_CACHE_FILE", "")
+
+# Concurrency and throttling retries for chunked GetParameters calls
+SSM_FETCH_MAX_WORKERS = int(os.environ.get("SSM_FETCH_MAX_WORKERS", "8"))
+SSM_THROTTLE_RETRIES = int(os.environ.get("SSM_THROTTLE_RETRIES", "5"))
+SSM_THROTTLE_BASE_DELAY = 0.1
+SSM_THROTTLE_MAX_DELAY = 2.0
+THROTTLING_ERROR_CODES = (
+    "ThrottlingException",
+    "Throttling",
+    "TooManyRequestsException",
+)
+
+# Renew cached Cognito access tokens this long before they expire
+COGNITO_TOKEN_REFRESH_MARGIN_SECONDS = float(
+    os.environ.get("COGNITO_TOKEN_REFRESH_MARGIN_SECONDS", "300")
+)
+
+# "describe" lists component names with DescribeParameters and then fetches
+# their values; "path" fetches names and values together with
+# GetParametersByPath where SSM supports it (parameters in this account)
+SSM_DISCOVERY_MODE = os.environ.get("SSM_DISCOVERY_MODE", "describe")
+
+# Stream probe results straight into the S3 report instead of building the
+# whole report in memory. The report is spooled to /tmp above the size limit.
+REPORT_STREAMING = os.environ.get("REPORT_STREAMING", "false").lower() == "true"
+REPORT_SPOOL_MAX_BYTES = int(os.environ.get("REPORT_SPOOL_MAX_BYTES", str(1024 * 1024)))
+
+# Key always holding the newest report. "copy" uploads the report once and
+# updates this key with a server-side CopyObject; "put" uploads the body to
+# both keys concurrently (one after the other for streamed reports, which are
+# read from a single file). If the copy fails, the body is uploaded instead.
+LATEST_REPORT_KEY = "health_check_latest.json"
+REPORT_LATEST_MODE = os.environ.get("REPORT_LATEST_MODE", "copy")
+
+# Skip the snapshot upload when no component's registration, status or
+# response code changed since the last uploaded report, and only write the
+# small REPORT_HEARTBEAT_KEY object. A full snapshot is still uploaded once the
+# last one is REPORT_SNAPSHOT_MAX_AGE_SECONDS old. The last report's hash is
+# kept in memory and in REPORT_STATE_FILE.
+REPORT_SKIP_UNCHANGED = (
+    os.environ.get("REPORT_SKIP_UNCHANGED", "false").lower() == "true"
+)
+REPORT_HEARTBEAT_KEY = "health_check_heartbeat.json"
+REPORT_SNAPSHOT_MAX_AGE_SECONDS = float(
+    os.environ.get("REPORT_SNAPSHOT_MAX_AGE_SECONDS", "3600")
+)
+REPORT_STATE_FILE = os.environ.get(
+    "REPORT_STATE_FILE", "/tmp/health_check_report_state.json"
+)
+
+# Append-only health history: one NDJSON line per service check, grouped into
+# "hourly" or "daily" segments stored as HISTORY_PREFIX/<period>.ndjson. Lines
+# are buffered in HISTORY_DIR, and the current segment is uploaded once
+# HISTORY_FLUSH_BYTES are pending, HISTORY_FLUSH_SECONDS have passed since the
+# last upload, or the segment rolls over. The default of 0 seconds uploads
+# after every run; lines buffered for longer are lost if the environment is
+# recycled.
+HEALTH_HISTORY = os.environ.get("HEALTH_HISTORY", "false").lower() == "true"
+HISTORY_SEGMENT = os.environ.get("HISTORY_SEGMENT", "hourly")
+HISTORY_PREFIX = os.environ.get("HISTORY_PREFIX", "health_history")
+HISTORY_DIR = os.environ.get("HISTORY_DIR", "/tmp/health_history")
+HISTORY_FLUSH_BYTES = int(os.environ.get("HISTORY_FLUSH_BYTES", str(1024 * 1024)))
+HISTORY_FLUSH_SECONDS = float(os.environ.get("HISTORY_FLUSH_SECONDS", "0"))
+HISTORY_SEGMENT_FORMATS = {"hourly": "%Y-%m-%dT%H", "daily": "%Y-%m-%d"}
+
+# Report encoding: REPORT_COMPACT drops the indentation, REPORT_GZIP compresses
+# the object and sets ContentEncoding: gzip. REPORT_SERIALIZER "auto" encodes
+# compact reports with orjson when it is installed; "json" always uses json.
+REPORT_COMPACT = os.environ.get("REPORT_COMPACT", "false").lower() == "true"
+REPORT_GZIP = os.environ.get("REPORT_GZIP", "false").lower() == "true"
+REPORT_GZIP_LEVEL = int(os.environ.get("REPORT_GZIP_LEVEL", "6"))
+REPORT_SERIALIZER = os.environ.get("REPORT_SERIALIZER", "auto")
+
+# Number of checks listed in each service's healthChecks, newest first so
+# healthChecks[0] is always the current check. The last checks of every registration are kept across warm invocations and in
+# CHECK_WINDOW_OBJECT between cold starts, so older snapshots are never read.
+# 1 lists only the current check.
+CHECK_WINDOW_SIZE = max(1, int(os.environ.get("CHECK_WINDOW_SIZE", "5")))
+CHECK_WINDOW_OBJECT = os.environ.get("CHECK_WINDOW_OBJECT", "health_check_windows.json")
+
+# Level of the lambda's log lines. DEBUG adds full dumps of the component
+# registrations and the health report.
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+
+# CloudWatch namespace for the Embedded Metric Format lines logged per run
+METRICS_NAMESPACE = os.environ.get("METRICS_NAMESPACE", "UnityCSMonitoring")
+# EMF limits: metrics per document and values per metric
+EMF_MAX_METRICS = 100
+EMF_MAX_VALUES = 100
+
+# Per-component latency histograms, kept across warm invocations and in this S3
+# object between cold starts. They are restarted once the window has elapsed.
+# Each power-of-two range of milliseconds is split into
+# LATENCY_HISTOGRAM_SUB_BUCKETS buckets, bounding the relative error.
+LATENCY_HISTOGRAMS = os.environ.get("LATENCY_HISTOGRAMS", "true").lower() == "true"
+LATENCY_HISTOGRAM_OBJECT = os.environ.get(
+    "LATENCY_HISTOGRAM_OBJECT", "health_check_latency_histograms.json"
+)
+LATENCY_HISTOGRAM_WINDOW_SECONDS = float(
+    os.environ.get("LATENCY_HISTOGRAM_WINDOW_SECONDS", str(24 * 60 * 60))
+)
+LATENCY_HISTOGRAM_SUB_BUCKETS = int(
+    os.environ.get("LATENCY_HISTOGRAM_SUB_BUCKETS", "8")
+)
+
+# Per-component uptime rollups: status counts over each of UPTIME_WINDOWS,
+# the current streak and the last state change, uploaded to UPTIME_OBJECT next
+# to health_check_latest.json. The counts they are computed from are kept
+# across warm invocations and in UPTIME_STATE_OBJECT between cold starts.
+UPTIME_ROLLUPS = os.environ.get("UPTIME_ROLLUPS", "true").lower() == "true"
+UPTIME_OBJECT = os.environ.get("UPTIME_OBJECT", "health_check_uptime.json")
+UPTIME_STATE_OBJECT = os.environ.get(
+    "UPTIME_STATE_OBJECT", "health_check_uptime_state.json"
+)
+UPTIME_STATUSES = ("HEALTHY", "UNHEALTHY", "TIMEOUT")
+# Window name: (length, resolution). The 1h window counts individual checks;
+# longer windows sum hourly or daily buckets, so they may include up to one
+# extra hour or day at their start.
+UPTIME_WINDOWS = {
+    "1h": (datetime.timedelta(hours=1), "check"),
+    "24h": (datetime.timedelta(hours=24), "hourly"),
+    "7d": (datetime.timedelta(days=7), "daily"),
+    "30d": (datetime.timedelta(days=30), "daily"),
+}
+UPTIME_BUCKET_FORMATS = {"hourly": "%Y-%m-%dT%H", "daily": "%Y-%m-%d"}
+
+# Same redirect limit as requests
+MAX_REDIRECTS = 30
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+
+
+# Values masked in log output: dictionary keys that look like credentials,
+# bearer tokens, JWTs and any value passed to register_secret
+REDACTED = "[REDACTED]"
+SECRET_KEY_PATTERN = re.compile(r"password|secret|token|authorization", re.IGNORECASE)
+SECRET_VALUE_PATTERN = re.compile(
+    r"(?<=Bearer )[\w.~+/=-]+|\beyJ[\w-]+\.[\w-]+\.[\w-]*", re.IGNORECASE
+)
+SECRET_MIN_LENGTH = 8
+_secrets = set()
+
+
+def register_secret(value):
+    """
+    Mask value wherever it appears in log output.
+
+    Values shorter than SECRET_MIN_LENGTH are ignored, since masking them would
+    mangle unrelated text; Cognito passwords and tokens are longer.
+    """
+    if value and len(str(value)) >= SECRET_MIN_LENGTH:
+        _secrets.add(str(value))
+
+
+def redact(value):
+    """
+    Return a copy of value with secrets masked, recursing into dicts and lists.
+
+    Parameters:
+    - value: String, dict, list or other value to redact.
+    """
+    if isinstance(value, str):
+        for secret in _secrets:
+            value = value.replace(secret, REDACTED)
+        return SECRET_VALUE_PATTERN.sub(REDACTED, value)
+    if isinstance(value, dict):
+        return {
+            key: (
+                REDACTED
+                if isinstance(key, str) and SECRET_KEY_PATTERN.search(key)
+                else redact(item)
+            )
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    return value
+
+
+class StructuredLogFormatter(logging.Formatter):
+    """
+    Formats log records as single-line JSON objects with secrets redacted.
+
+    Structured fields are passed with extra={"fields": {...}}. Message
+    arguments and fields are only formatted when a record is emitted, so
+    debug dumps cost nothing when DEBUG is disabled.
+    """
+
+    def format(self, record):
+        message = str(record.msg)
+        if record.args:
+            # Redacted before they are formatted in, so the keys of a dict
+            # argument still mark its secrets
+            args = record.args
+            message %= redact(args) if isinstance(args, dict) else tuple(redact(args))
+        document = {
+            "timestamp": datetime.datetime.fromtimestamp(
+                record.created, datetime.timezone.utc
+            ).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "message": redact(message),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            document.update(redact(fields))
+        if record.exc_info:
+            document["exception"] = redact(self.formatException(record.exc_info))
+        return json.dumps(document, default=str, separators=(",", ":"))
+
+
+logger = logging.getLogger("unity_cs_monitoring")
+logger.setLevel(LOG_LEVEL)
+# Lambda forwards stdout to CloudWatch Logs; do not also go through the
+# runtime's root handler
+log_handler = logging.StreamHandler(sys.stdout)
+log_handler.setFormatter(StructuredLogFormatter())
+logger.addHandler(log_handler)
+logger.propagate = False
+
+
+class InvocationMetrics:
+    """
+    Collects timings and counts during one invocation and logs them as CloudWatch Embedded Metric Format (EMF) lines.
+
+    CloudWatch extracts the metrics from the log lines, so no PutMetricData
+    calls are needed. A metric recorded several times (for example one value
+    per probe) is emitted as a value array.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def reset(self):
+        with self._lock:
+            self._values = {}
+
+    def add(self, name, value, unit="Milliseconds"):
+        if isinstance(value, float):
+            value = round(value, 3)
+        with self._lock:
+            self._values.setdefault(name, (unit, []))[1].append(value)
+
+    @contextmanager
+    def span(self, name):
+        """
+        Record the wall time of the with block, in milliseconds, as the metric "<name>Time".
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(f"{name}Time", (time.perf_counter() - start) * 1000)
+
+    def emf_documents(self, dimensions):
+        """
+        Return the recorded metrics as EMF documents, splitting them to stay within the EMF limits.
+
+        Parameters:
+        - dimensions (dict): Dimension names and values attached to every metric.
+        """
+        with self._lock:
+            values = {name: (unit, list(v)) for name, (unit, v) in self._values.items()}
+
+        documents = []
+        while values:
+            names = list(values)[:EMF_MAX_METRICS]
+            document = {
+                "_aws": {
+                    "Timestamp": int(time.time() * 1000),
+                    "CloudWatchMetrics": [
+                        {
+                            "Namespace": METRICS_NAMESPACE,
+                            "Dimensions": [list(dimensions)],
+                            "Metrics": [
+                                {"Name": name, "Unit": values[name][0]}
+                                for name in names
+                            ],
+                        }
+                    ],
+                },
+                **dimensions,
+            }
+            for name in names:
+                unit, metric_values = values[name]
+                batch = metric_values[:EMF_MAX_VALUES]
+                document[name] = batch[0] if len(batch) == 1 else batch
+                if len(metric_values) > EMF_MAX_VALUES:
+                    values[name] = (unit, metric_values[EMF_MAX_VALUES:])
+                else:
+                    del values[name]
+            documents.append(document)
+        return documents
+
+    def emit(self, dimensions):
+        """
+        Print the recorded metrics as EMF lines on stdout, where Lambda forwards them to CloudWatch Logs.
+        """
+        for document in self.emf_documents(dimensions):
+            print(json.dumps(document, separators=(",", ":")))
+
+
+# Metrics for the current invocation; reset by lambda_handler
+metrics = InvocationMetrics()
+
+
+class LatencyHistogram:
+    """
+    Sparse log-linear latency histogram in the style of HdrHistogram.
+
+    Values below 1 ms share bucket 0. Above that, each power-of-two range is
+    split into sub_buckets equal buckets, so percentiles are reported with a
+    relative error of at most 1 / sub_buckets and a histogram of thousands of
+    samples serialises to a few dozen bucket counts.
+    """
+
+    def __init__(self, sub_buckets=None):
+        self.sub_buckets = sub_buckets or LATENCY_HISTOGRAM_SUB_BUCKETS
+        self.counts = {}
+        self.count = 0
+        self.max = 0
+
+    def bucket_index(self, value_ms):
+        if value_ms < 1:
+            return 0
+        exponent = int(value_ms).bit_length() - 1
+        sub_bucket = int((value_ms / (1 << exponent) - 1) * self.sub_buckets)
+        return 1 + exponent * self.sub_buckets + sub_bucket
+
+    def bucket_upper_bound(self, index):
+        if index == 0:
+            return 1
+        exponent, sub_bucket = divmod(index - 1, self.sub_buckets)
+        return (1 << exponent) * (1 + (sub_bucket + 1) / self.sub_buckets)
+
+    def record(self, value_ms):
+        index = self.bucket_index(value_ms)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.max = max(self.max, value_ms)
+
+    def percentile(self, percent):
+        """
+        Return the upper bound of the bucket holding the given percentile, capped at the largest recorded value.
+        """
+        if not self.count:
+            return None
+        threshold = self.count * percent / 100
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= threshold:
+                break
+        return round(min(self.bucket_upper_bound(index), self.max), 3)
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "buckets": {str(index): n for index, n in sorted(self.counts.items())},
+        }
+
+    @classmethod
+    def from_dict(cls, data, sub_buckets=None):
+        histogram = cls(sub_buckets)
+        histogram.counts = {int(index): n for index, n in data["buckets"].items()}
+        histogram.count = data["count"]
+        histogram.max = data["max"]
+        return histogram
+
+
+class UptimeRollup:
+    """
+    Status counts of one component, updated one check at a time.
+
+    Checks from the last hour are kept individually; older ones only as
+    hourly and daily counts, so a component's state stays a few dozen
+    entries however often it is probed.
+    """
+
+    def __init__(self):
+        self.recent = []
+        self.buckets = {resolution: {} for resolution in UPTIME_BUCKET_FORMATS}
+        self.streak = None
+        self.last_change = None
+
+    def record(self, date, status):
+        """
+        Count a check made at date, a naive ISO timestamp.
+        """
+        if self.streak is None or self.streak["status"] != status:
+            if self.streak is not None:
+                self.last_change = {
+                    "date": date,
+                    "from": self.streak["status"],
+                    "to": status,
+                }
+            self.streak = {"status": status, "count": 0, "since": date}
+        self.streak["count"] += 1
+        self.recent.append([date, status])
+        timestamp = datetime.datetime.fromisoformat(date)
+        for resolution, date_format in UPTIME_BUCKET_FORMATS.items():
+            counts = self.buckets[resolution].setdefault(
+                timestamp.strftime(date_format), {}
+            )
+            counts[status] = counts.get(status, 0) + 1
+
+    def window_start(self, now, window):
+        length, resolution = UPTIME_WINDOWS[window]
+        start = now - length
+        if resolution == "check":
+            return start.isoformat()
+        return start.strftime(UPTIME_BUCKET_FORMATS[resolution])
+
+    def prune(self, now):
+        """
+        Drop checks and buckets outside every window and return whether any remain.
+        """
+        # ISO timestamps and bucket names of one format sort chronologically
+        recent_start = self.window_start(now, "1h")
+        self.recent = [check for check in self.recent if check[0] >= recent_start]
+        for resolution, buckets in self.buckets.items():
+            start = min(
+                self.window_start(now, window)
+                for window, (_, window_resolution) in UPTIME_WINDOWS.items()
+                if window_resolution == resolution
+            )
+            for name in [name for name in buckets if name < start]:
+                del buckets[name]
+        return any(self.buckets.values())
+
+    def counts(self, now, window):
+        counts = dict.fromkeys(UPTIME_STATUSES, 0)
+        start = self.window_start(now, window)
+        resolution = UPTIME_WINDOWS[window][1]
+        if resolution == "check":
+            for date, status in self.recent:
+                if date >= start:
+                    counts[status] = counts.get(status, 0) + 1
+        else:
+            for name, bucket in self.buckets[resolution].items():
+                if name >= start:
+                    for status, n in bucket.items():
+                        counts[status] = counts.get(status, 0) + n
+        total = sum(counts.values())
+        counts["total"] = total
+        counts["availability"] = round(counts["HEALTHY"] / total, 5) if total else None
+        return counts
+
+    def summary(self, now):
+        return {
+            "windows": {window: self.counts(now, window) for window in UPTIME_WINDOWS},
+            "streak": self.streak,
+            "lastChange": self.last_change,
+        }
+
+    def to_dict(self):
+        return {
+            "recent": self.recent,
+            **self.buckets,
+            "streak": self.streak,
+            "lastChange": self.last_change,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        rollup = cls()
+        rollup.recent = data["recent"]
+        for resolution in UPTIME_BUCKET_FORMATS:
+            rollup.buckets[resolution] = data[resolution]
+        rollup.streak = data["streak"]
+        rollup.last_change = data["lastChange"]
+        return rollup
+
+
+_aws_clients = {}
+_aws_clients_lock = threading.Lock()
+_botocore_session = None
+
+
+def get_aws_client(service_name, region_name=None, max_attempts=None):
+    """
+    Return a botocore client for the service and region, creating it on first use.
+
+    Clients are kept at module scope so warm invocations skip loading the
+    service models again. They come from a botocore session rather than
+    boto3, because importing boto3 also imports its S3 transfer manager,
+    which took most of the cold-start import time. They have the same
+    methods as boto3.client, but none of the extras boto3 injects, such as
+    s3.upload_file or s3.download_file.
+
+    Parameters:
+    - service_name (str): AWS service name, e.g. "ssm".
+    - region_name (str): Region for the client. Defaults to the Lambda's region.
+    - max_attempts (int): Total attempts per call, including the first, instead of
+      botocore's retry settings. Such clients are cached separately.
+    """
+    global _botocore_session
+    region_name = (
+        region_name
+        or os.environ.get("AWS_REGION")
+        or os.environ.get("AWS_DEFAULT_REGION")
+    )
+    key = (service_name, region_name)
+    if max_attempts is not None:
+        key += (max_attempts,)
+    client = _aws_clients.get(key)
+    if client is None:
+        with _aws_clients_lock:
+            client = _aws_clients.get(key)
+            if client is None:
+                if _botocore_session is None:
+                    import botocore.session
+
+                    _botocore_session = botocore.session.get_session()
+                config = None
+                if max_attempts is not None:
+                    import botocore.config
+
+                    config = botocore.config.Config(
+                        retries={"total_max_attempts": max_attempts}
+                    )
+                client = _botocore_session.create_client(
+                    service_name, region_name=region_name, config=config
+                )
+                _aws_clients[key] = client
+    return client
+
+
+# Maps cache keys to (stored_at, value); loaded from SSM_CACHE_FILE on first use
+_ssm_cache = {}
+_ssm_cache_loaded = False
+_ssm_cache_lock = threading.Lock()
+
+
+def _load_ssm_cache():
+    global _ssm_cache_loaded
+    if _ssm_cache_loaded:
+        return
+    _ssm_cache_loaded = True
+    if not SSM_CACHE_FILE:
+        return
+    try:
+        with open(SSM_CACHE_FILE) as f:
+            _ssm_cache.update(
+                {key: tuple(entry) for key, entry in json.load(f).items()}
+            )
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.error("Error reading SSM cache file %s: %s", SSM_CACHE_FILE, e)
+
+
+def _save_ssm_cache():
+    if not SSM_CACHE_FILE:
+        return
+    try:
+        tmp_name = f"{SSM_CACHE_FILE}.tmp"
+        # The cache holds decrypted values; keep it private to the function
+        fd = os.open(tmp_name, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(_ssm_cache, f)
+        os.replace(tmp_name, SSM_CACHE_FILE)
+    except Exception as e:
+        logger.error("Error writing SSM cache file %s: %s", SSM_CACHE_FILE, e)
+
+
+def ssm_cache_get(key):
+    """
+    Return the cached value for key, or None if it is missing or older than SSM_CACHE_TTL_SECONDS.
+
+    Parameters:
+    - key (str): Cache key.
+    """
+    if SSM_CACHE_TTL_SECONDS <= 0:
+        return None
+    with _ssm_cache_lock:
+        _load_ssm_cache()
+        entry = _ssm_cache.get(key)
+    if entry is None or time.time() - entry[0] > SSM_CACHE_TTL_SECONDS:
+        return None
+    return entry[1]
+
+
+def ssm_cache_put(entries):
+    """
+    Store several values in the SSM cache and persist it to SSM_CACHE_FILE if configured.
+
+    Parameters:
+    - entries (dict): Mapping of cache keys to JSON-serialisable values.
+    """
+    if SSM_CACHE_TTL_SECONDS <= 0 or not entries:
+        return
+    now = time.time()
+    with _ssm_cache_lock:
+        _load_ssm_cache()
+        for key, value in entries.items():
+            _ssm_cache[key] = (now, value)
+        _save_ssm_cache()
+
+
+def invalidate_ssm_cache(prefix=""):
+    """
+    Drop cached SSM entries so the next lookup goes to SSM.
+
+    Call this (or invoke the lambda with {"invalidateSsmCache": true}) after
+    registering new components.
+
+    Parameters:
+    - prefix (str): Only drop parameters whose name contains this prefix. Defaults to everything.
+    """
+    with _ssm_cache_lock:
+        _load_ssm_cache()
+        for key in [key for key in _ssm_cache if prefix in key.partition(":")[2]]:
+            del _ssm_cache[key]
+        _save_ssm_cache()
+
+
+def get_ssm_parameter_value(
+    parameter_names, shared=False, max_workers=None, on_values=None, keep_values=True
+):
     """
     Retrieve multiple SSM parameters using Boto3, with optional account prefixing for shared parameters.
 
+    Names are fetched in chunks of 10, with the chunks issued concurrently.
+
     Parameters:
     - parameter_names (list of str): Names of the parameters to retrieve.
     - shared (bool): Indicates whether the parameters are shared across accounts.
+    - max_workers (int): Maximum number of concurrent GetParameters calls. Defaults to SSM_FETCH_MAX_WORKERS.
+    - on_values (callable): Optional callback receiving each batch of {name: value} as soon as it is available.
+    - keep_values (bool): If False, values are only passed to on_values and an empty dictionary is returned.
     """
-    ssm = boto3.client("ssm")
+    ssm = get_aws_client("ssm")
     max_params_per_call = 10
 
     if shared:
         # Get the account ID parameter
-        try:
-            account_response = ssm.get_parameter(
-                Name="/unity/shared-services/aws/account"
-            )
-            account_id = account_response["Parameter"]["Value"]
-        except Exception as e:
-            print(f"Error retrieving AWS account ID: {e}", file=sys.stderr)
-            return {}
+        account_id = ssm_cache_get("value:/unity/shared-services/aws/account")
+        if account_id is None:
+            try:
+                account_response = ssm.get_parameter(
+                    Name="/unity/shared-services/aws/account"
+                )
+                account_id = account_response["Parameter"]["Value"]
+            except Exception as e:
+                logger.error("Error retrieving AWS account ID: %s", e)
+                return {}
+            ssm_cache_put({"value:/unity/shared-services/aws/account": account_id})
 
         # Prepend the account ID to each parameter name
         parameter_names = [
@@ -37,28 +729,111 @@ def get_ssm_parameter_value(parameter_names, shared=False):
 
     all_parameters = {}
 
-    for i in range(0, len(parameter_names), max_params_per_call):
-        chunk = parameter_names[i : i + max_params_per_call]
-        try:
-            response = ssm.get_parameters(Names=chunk, WithDecryption=True)
+    # Serve fresh values from the cache; cached entries are (returned name, value)
+    missing_names = []
+    for name in parameter_names:
+        cached = ssm_cache_get(f"value:{name}")
+        if cached is None:
+            missing_names.append(name)
+        else:
+            all_parameters[cached[0]] = cached[1]
+    if all_parameters and on_values is not None:
+        on_values(dict(all_parameters))
+    if not keep_values:
+        all_parameters = {}
 
-            if response["InvalidParameters"]:
-                print(
-                    f"Invalid parameters: {response['InvalidParameters']}",
-                    file=sys.stderr,
-                )
+    # Throttled chunks are retried by _get_parameters_chunk alone, so the
+    # client's own retries are turned off
+    chunk_ssm = get_aws_client("ssm", max_attempts=1)
 
-            # Extract parameter values into a dictionary
-            all_parameters.update(
-                {param["Name"]: param["Value"] for param in response["Parameters"]}
-            )
-        except Exception as e:
-            print(f"Error retrieving parameters: {e}", file=sys.stderr)
+    def fetch_chunk(chunk):
+        response = _get_parameters_chunk(chunk_ssm, chunk)
+        if response is None:
+            return None
+        if response["InvalidParameters"]:
+            logger.warning("Invalid parameters: %s", response["InvalidParameters"])
+        values = {param["Name"]: param["Value"] for param in response["Parameters"]}
+        if on_values is not None:
+            on_values(values)
+        # Keep only what is merged below rather than the whole response
+        cache_entries = (
+            _ssm_cache_entries(chunk, response["Parameters"])
+            if SSM_CACHE_TTL_SECONDS > 0
+            else {}
+        )
+        return values if keep_values else {}, cache_entries
+
+    chunks = [
+        missing_names[i : i + max_params_per_call]
+        for i in range(0, len(missing_names), max_params_per_call)
+    ]
+    max_workers = max(1, min(max_workers or SSM_FETCH_MAX_WORKERS, len(chunks) or 1))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        responses = list(executor.map(fetch_chunk, chunks))
+
+    # Merge in chunk order so the result matches a sequential fetch
+    fetched = {}
+    for response in responses:
+        if response is None:
             continue
+        values, cache_entries = response
+        all_parameters.update(values)
+        fetched.update(cache_entries)
 
+    ssm_cache_put(fetched)
     return all_parameters
 
 
+def _get_parameters_chunk(ssm, chunk):
+    """
+    Call GetParameters for one chunk of names, retrying throttling errors with full-jitter backoff.
+
+    Returns the response, or None if the chunk could not be fetched. A call is
+    made at most SSM_THROTTLE_RETRIES + 1 times when ssm has botocore's
+    retries turned off.
+
+    Parameters:
+    - ssm: SSM client, created with max_attempts=1.
+    - chunk (list of str): Up to 10 parameter names.
+    """
+    for attempt in range(SSM_THROTTLE_RETRIES + 1):
+        try:
+            return ssm.get_parameters(Names=chunk, WithDecryption=True)
+        except botocore.exceptions.ClientError as e:
+            error_code = e.response.get("Error", {}).get("Code")
+            if error_code in THROTTLING_ERROR_CODES and attempt < SSM_THROTTLE_RETRIES:
+                delay = min(
+                    SSM_THROTTLE_MAX_DELAY, SSM_THROTTLE_BASE_DELAY * 2**attempt
+                )
+                time.sleep(random.uniform(0, delay))
+                continue
+            logger.error("Error retrieving parameters: %s", e)
+            return None
+        except Exception as e:
+            logger.error("Error retrieving parameters: %s", e)
+            return None
+
+
+def _ssm_cache_entries(requested_names, parameters):
+    """
+    Map each requested name to the (Name, Value) SSM returned for it.
+
+    SSM may return a shared parameter under its plain name even when it was
+    requested by ARN, so match on either form.
+    """
+    entries = {}
+    by_name = {}
+    for param in parameters:
+        by_name[param["Name"]] = param
+        if param.get("ARN"):
+            by_name[param["ARN"]] = param
+    for name in requested_names:
+        param = by_name.get(name) or by_name.get(name.partition(":parameter")[2])
+        if param is not None:
+            entries[f"value:{name}"] = (param["Name"], param["Value"])
+    return entries
+
+
 def fetch_health_status_ssm_values(shared_ssm, project, venue):
     """
     Fetches health status related SSM value based on shared or local setting.
@@ -69,7 +844,7 @@ def fetch_health_status_ssm_values(shared_ssm, project, venue):
     - venue (string): Name of venue
     """
     # Create an SSM client
-    ssm_client = boto3.client("ssm")
+    ssm_client = get_aws_client("ssm")
 
     # Determine the prefix based on the local_only flag
     if shared_ssm:
@@ -77,6 +852,11 @@ def fetch_health_status_ssm_values(shared_ssm, project, venue):
     else:
         prefix = f"/unity/{project}/{venue}/component/"
 
+    cache_key = f"names:{prefix}"
+    cached = ssm_cache_get(cache_key)
+    if cached is not None:
+        return list(cached)
+
     # Initialize the list to store specific parameter names
     parameter_names = []
 
@@ -97,185 +877,2236 @@ def fetch_health_status_ssm_values(shared_ssm, project, venue):
                 # Add parameter name to the list
                 parameter_names.append(param["Name"])
 
+    ssm_cache_put({cache_key: parameter_names})
     return parameter_names
 
 
-def create_cognito_client(cognito_info):
+def fetch_health_status_ssm_parameters(
+    shared_ssm, project, venue, on_values=None, keep_values=True
+):
     """
-    Create a Cognito client and initiate authentication to get an access token.
+    Fetches health status related SSM names and values based on shared or local setting.
+
+    With SSM_DISCOVERY_MODE=path, local parameters are read in a single
+    paginated GetParametersByPath stream. GetParametersByPath cannot read
+    parameters shared from another account, so shared parameters (and every
+    parameter in describe mode) go through discovery followed by GetParameters.
 
     Parameters:
-    - cognito_info (dict): Dictionary containing Cognito credentials and client ID.
+    - shared_ssm (bool): If True, fetch shared parameters; otherwise, fetch local parameters.
+    - project (string): Name of project
+    - venue (string): Name of venue
+    - on_values (callable): Optional callback receiving each batch of {name: value} as soon as it is available.
+    - keep_values (bool): If False, values are only passed to on_values and an empty dictionary is returned.
     """
-    client = boto3.client("cognito-idp")
-    response = client.initiate_auth(
-        AuthFlow="USER_PASSWORD_AUTH",
-        AuthParameters={
-            "USERNAME": cognito_info[
-                "/unity/shared-services/cognito/monitoring-username"
-            ],
-            "PASSWORD": cognito_info[
-                "/unity/shared-services/cognito/monitoring-password"
-            ],
-        },
-        ClientId=cognito_info["/unity/shared-services/dapa/client-id"],
-    )
-    return response["AuthenticationResult"]["AccessToken"]
+    if shared_ssm or SSM_DISCOVERY_MODE != "path":
+        with metrics.span("Discovery"):
+            parameter_names = fetch_health_status_ssm_values(shared_ssm, project, venue)
+        with metrics.span("ValueFetch"):
+            return get_ssm_parameter_value(
+                parameter_names,
+                shared=shared_ssm,
+                on_values=on_values,
+                keep_values=keep_values,
+            )
+
+    prefix = f"/unity/{project}/{venue}/component/"
+    cache_key = f"names:{prefix}"
+    cached_names = ssm_cache_get(cache_key)
+    if cached_names is not None:
+        with metrics.span("ValueFetch"):
+            return get_ssm_parameter_value(
+                cached_names,
+                shared=False,
+                on_values=on_values,
+                keep_values=keep_values,
+            )
+
+    # Names and values arrive together, so the stream counts as discovery.
+    # The cache needs every value even when the caller does not.
+    caching = SSM_CACHE_TTL_SECONDS > 0
+    with metrics.span("Discovery"):
+        parameters, complete = _get_parameters_by_path(
+            prefix, on_values, keep_values=keep_values or caching
+        )
+    if complete and caching:
+        cache_entries = {
+            f"value:{name}": (name, value) for name, value in parameters.items()
+        }
+        cache_entries[cache_key] = list(parameters)
+        ssm_cache_put(cache_entries)
+    return parameters if keep_values else {}
 
 
-def check_service_health(service_infos, access_token):
+def _get_parameters_by_path(prefix, on_values, keep_values=True):
     """
-    Check the health status of each service by making HTTP requests with the appropriate authorization headers.
+    Stream every parameter under prefix with GetParametersByPath.
 
-    Parameters:
-    - service_infos (dict): Dictionary mapping service names to their details.
-    - access_token (str): Access token for authentication.
+    Returns the {name: value} dictionary, empty unless keep_values is set, and
+    whether the stream completed.
     """
-    health_status = {"services": []}
-    headers = {"Authorization": f"Bearer {access_token}"}
+    ssm_client = get_aws_client("ssm")
+    parameters = {}
+    paginator = ssm_client.get_paginator("get_parameters_by_path")
+    page_iterator = paginator.paginate(
+        Path=prefix.rstrip("/"),
+        Recursive=True,
+        WithDecryption=True,
+        PaginationConfig={"PageSize": 10},
+    )
+    try:
+        for page in page_iterator:
+            page_parameters = {
+                param["Name"]: param["Value"]
+                for param in page.get("Parameters", [])
+                if param["Name"].startswith(prefix)
+            }
+            if keep_values:
+                parameters.update(page_parameters)
+            if page_parameters and on_values is not None:
+                on_values(page_parameters)
+    except Exception as e:
+        logger.error("Error retrieving parameters by path %s: %s", prefix, e)
+        return parameters, False
+    return parameters, True
 
-    for ssm_key, service_info in service_infos.items():
-        service_info_dict = json.loads(service_info)
-        service_name = service_info_dict.get("componentName")
-        health_check_url = service_info_dict.get("healthCheckUrl")
-        landing_page_url = service_info_dict.get("landingPageUrl")
-        # Get new fields with default value of "EMPTY" if not found
-        component_category = service_info_dict.get("componentCategory", "EMPTY")
-        component_type = service_info_dict.get("componentType", "EMPTY")
-        description = service_info_dict.get("description", "EMPTY")
 
-        try:
-            response = requests.get(health_check_url, headers=headers)
-            status = "HEALTHY" if response.status_code == 200 else "UNHEALTHY"
-            http_response_code = response.status_code
-        except Exception as e:
-            status = "UNHEALTHY"
-            http_response_code = "N/A"
-            print(f"Error accessing {health_check_url}: {e}", file=sys.stderr)
-
-        health_status["services"].append(
-            {
-                "componentName": service_name,
-                "componentCategory": component_category,
-                "componentType": component_type,
-                "description": description,
-                "ssmKey": ssm_key,
-                "healthCheckUrl": health_check_url,
-                "landingPageUrl": landing_page_url,
-                "healthChecks": [
-                    {
-                        "status": status,
-                        "httpResponseCode": str(http_response_code),
-                        "date": datetime.datetime.now().isoformat(),
-                    }
-                ],
-            }
-        )
-    return health_status
+# Access tokens keyed by (client ID, username), reused across warm invocations
+_cognito_tokens = {}
+_cognito_tokens_lock = threading.Lock()
 
 
-def upload_json_to_s3(json_data, bucket_name, object_name):
+def _cache_cognito_token(key, authentication_result, refresh_token=None):
+    token = {
+        "access_token": authentication_result["AccessToken"],
+        # REFRESH_TOKEN_AUTH responses do not include a new refresh token
+        "refresh_token": authentication_result.get("RefreshToken", refresh_token),
+        "expires_at": time.time() + authentication_result.get("ExpiresIn", 3600),
+    }
+    _cognito_tokens[key] = token
+    register_secret(token["access_token"])
+    register_secret(token["refresh_token"])
+    return token["access_token"]
+
+
+def create_cognito_client(cognito_info):
     """
-    Upload JSON data to an S3 bucket.
+    Create a Cognito client and initiate authentication to get an access token.
+
+    The token is cached per client ID and username and reused until it is
+    within COGNITO_TOKEN_REFRESH_MARGIN_SECONDS of expiring, at which point it
+    is renewed with the refresh token instead of a full password auth.
 
     Parameters:
-    - json_data (dict): JSON data to upload.
-    - bucket_name (str): Bucket to upload to.
-    - object_name (str): S3 object name.
+    - cognito_info (dict): Dictionary containing Cognito credentials and client ID.
     """
-    # Create an S3 client
-    s3_client = boto3.client("s3")
+    client = get_aws_client("cognito-idp")
+    username = cognito_info["/unity/shared-services/cognito/monitoring-username"]
+    client_id = cognito_info["/unity/shared-services/dapa/client-id"]
+    key = (client_id, username)
+    register_secret(cognito_info["/unity/shared-services/cognito/monitoring-password"])
 
-    try:
-        # Convert the JSON data to a formatted string with indentation
-        json_string = json.dumps(json_data, indent=4)
+    with _cognito_tokens_lock:
+        cached = _cognito_tokens.get(key)
+        if cached is not None:
+            remaining = cached["expires_at"] - time.time()
+            if remaining > COGNITO_TOKEN_REFRESH_MARGIN_SECONDS:
+                return cached["access_token"]
 
-        # Upload the JSON 
-        s3_client.put_object(
-            Bucket=bucket_name,
-            Key=object_name,
-            Body=json_string,
-            ContentType="application/json",
-        )
+            if cached["refresh_token"]:
+                try:
+                    response = client.initiate_auth(
+                        AuthFlow="REFRESH_TOKEN_AUTH",
+                        AuthParameters={"REFRESH_TOKEN": cached["refresh_token"]},
+                        ClientId=client_id,
+                    )
+                    return _cache_cognito_token(
+                        key, response["AuthenticationResult"], cached["refresh_token"]
+                    )
+                except Exception as e:
+                    logger.warning("Error refreshing Cognito token: %s", e)
 
-        # Also upload the JSON string as the latest file
-        s3_client.put_object(
-            Bucket=bucket_name,
-            Key="health_check_latest.json",
-            Body=json_string,
-            ContentType="application/json",
+        response = client.initiate_auth(
+            AuthFlow="USER_PASSWORD_AUTH",
+            AuthParameters={
+                "USERNAME": username,
+                "PASSWORD": cognito_info[
+                    "/unity/shared-services/cognito/monitoring-password"
+                ],
+            },
+            ClientId=client_id,
         )
-        
-        return True, "JSON uploaded successfully."
-    except Exception as e:
-        # The upload failed; return False and the error
-        return False, str(e)
+        return _cache_cognito_token(key, response["AuthenticationResult"])
 
 
-def lambda_handler(event, context):
-    """AWS Lambda function handler with print statements for debugging."""
-    project = os.environ.get("PROJECT")
-    venue = os.environ.get("VENUE")
-    print("PROJECT:", project)
-    print("VENUE:", venue)
+# Cumulative across warm invocations; "requests" counts requests sent through
+# the shared session, "opened" counts sockets it had to open, including
+# reconnects of keep-alive connections the server had closed
+_http_connection_stats = {"requests": 0, "opened": 0}
+_http_connection_stats_lock = threading.Lock()
+_http_session = None
+_http_session_lock = threading.Lock()
 
-    bucket_name = f"unity-{project}-{venue}-bucket"
-    print("BUCKET_NAME")
-    print("BUCKET_NAME", bucket_name)
 
-    print(f"boto3 version: {boto3.__version__}")
-    print(f"botocore version: {botocore.__version__}")
+def _count_http_stat(name):
+    with _http_connection_stats_lock:
+        _http_connection_stats[name] += 1
 
-    shared_parameters_cognito = [
-        "/unity/shared-services/cognito/monitoring-username",
-        "/unity/shared-services/cognito/monitoring-password",
-        "/unity/shared-services/dapa/client-id",
-    ]
 
-    # Fetch shared parameters
-    cognito_info = get_ssm_parameter_value(shared_parameters_cognito, shared=True)
-    print("COGNITO INFO:", cognito_info)
+# Phase timings, in milliseconds, of the probe running on the current thread.
+# _probe_outcome sets "current"; the connection classes and adapter fill it in.
+_probe_timings = threading.local()
 
-    shared_services_health_ssm = fetch_health_status_ssm_values(True, project, venue)
-    print("SHARED SERVICED SSM:", shared_services_health_ssm)
 
-    local_health_ssm = fetch_health_status_ssm_values(False, project, venue)
-    print("LOCAL HEALTH SSM:", local_health_ssm)
+def _record_probe_timing(phase, seconds):
+    timings = getattr(_probe_timings, "current", None)
+    if timings is not None:
+        timings[phase] = round(seconds * 1000, 3)
 
-    token = create_cognito_client(cognito_info)
-    print("Access Token:", token)
 
-    shared_services_health_info = get_ssm_parameter_value(
-        shared_services_health_ssm, shared=True
-    )
+class TimedHTTPConnection(HTTPConnection):
+    def _new_conn(self):
+        # urllib3 resolves and connects in one step, so "connect" includes DNS
+        start = time.perf_counter()
+        sock = super()._new_conn()
+        _record_probe_timing("connect", time.perf_counter() - start)
+        _count_http_stat("opened")
+        return sock
 
-    local_health_info = get_ssm_parameter_value(local_health_ssm, shared=False)
 
-    print("SHARED SERVICES INFO:", shared_services_health_info)
-    print("LOCAL HEALTH INFO:", local_health_info)
+class TimedHTTPSConnection(HTTPSConnection):
+    def _new_conn(self):
+        start = time.perf_counter()
+        sock = super()._new_conn()
+        _count_http_stat("opened")
+        self._tcp_seconds = time.perf_counter() - start
+        _record_probe_timing("connect", self._tcp_seconds)
+        return sock
 
-    # Combine shared and local health information
-    combined_health_info = {**shared_services_health_info, **local_health_info}
-    print("COMBINED HEALTH INFO:", combined_health_info)
+    def connect(self):
+        self._tcp_seconds = 0
+        start = time.perf_counter()
+        super().connect()
+        _record_probe_timing("tls", time.perf_counter() - start - self._tcp_seconds)
 
-    # Check the health status using the combined health information
-    health_status = check_service_health(combined_health_info, token)
 
-    print("Health Status:", health_status)
+# A pool reconnects a dropped keep-alive connection on the same connection
+# object, so sockets are counted by the connections rather than the pools
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
 
-    now = datetime.datetime.now()
-    filename = now.strftime("health_check_%Y-%m-%d_%H-%M-%S.json")
 
-    # Upload the JSON data to S3
-    upload_status, upload_message = upload_json_to_s3(
-        health_status, bucket_name, filename
-    )
-    print("Upload Status:", upload_message)
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class CountingHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that records how many requests were served on new vs. reused connections."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool,
+            "https": TimedHTTPSConnectionPool,
+        }
+
+    def send(self, request, **kwargs):
+        _count_http_stat("requests")
+        timings = getattr(_probe_timings, "current", None)
+        if timings is not None:
+            # Only the last request of a redirect chain is reported
+            timings.clear()
+        start = time.perf_counter()
+        response = super().send(request, **kwargs)
+        if timings is not None:
+            # send returns once the headers are read; TTFB excludes opening
+            # the connection
+            setup = timings.get("connect", 0) + timings.get("tls", 0)
+            elapsed = (time.perf_counter() - start) * 1000
+            timings["ttfb"] = round(max(0, elapsed - setup), 3)
+        return response
+
+
+def get_http_session():
+    """
+    Return the module-scoped requests session, creating it on first use.
+
+    The session keeps per-host keep-alive pools, so warm invocations reuse
+    connections opened by earlier ones.
+    """
+    global _http_session
+    if _http_session is None:
+        with _http_session_lock:
+            if _http_session is None:
+                session = requests.Session()
+                adapter = CountingHTTPAdapter(
+                    pool_connections=HTTP_POOL_CONNECTIONS,
+                    pool_maxsize=HTTP_POOL_MAXSIZE,
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _http_session = session
+    return _http_session
+
+
+def get_http_connection_stats():
+    """
+    Return cumulative counts of requests sent through the shared session and of connections opened vs. reused.
+    """
+    with _http_connection_stats_lock:
+        requests_sent = _http_connection_stats["requests"]
+        opened = _http_connection_stats["opened"]
+    return {
+        "requests": requests_sent,
+        "opened": opened,
+        "reused": max(0, requests_sent - opened),
+    }
+
+
+def deadline_from_context(context):
+    """
+    Return the time.monotonic() value by which the run must stop waiting, or None if there is no Lambda context.
+
+    DEADLINE_RESERVE_SECONDS before the Lambda timeout, leaving time to upload
+    whatever report is available by then.
+
+    Parameters:
+    - context: Lambda context object.
+    """
+    get_remaining_time = getattr(context, "get_remaining_time_in_millis", None)
+    if get_remaining_time is None:
+        return None
+    return time.monotonic() + get_remaining_time() / 1000 - DEADLINE_RESERVE_SECONDS
+
+
+def time_remaining(deadline):
+    """
+    Return the seconds left until deadline (never negative), or None if there is no deadline.
+    """
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+def parse_service_info(service_info):
+    """
+    Parse a component registration stored in SSM into the fields reported in the health status.
+
+    Parameters:
+    - service_info (str): JSON registration document stored in SSM.
+    """
+    service_info_dict = json.loads(service_info)
+    return {
+        "componentName": service_info_dict.get("componentName"),
+        # Get new fields with default value of "EMPTY" if not found
+        "componentCategory": service_info_dict.get("componentCategory", "EMPTY"),
+        "componentType": service_info_dict.get("componentType", "EMPTY"),
+        "description": service_info_dict.get("description", "EMPTY"),
+        "healthCheckUrl": service_info_dict.get("healthCheckUrl"),
+        "landingPageUrl": service_info_dict.get("landingPageUrl"),
+        # How to probe; not part of the reported entry
+        "probeMethod": str(service_info_dict.get("probeMethod", "GET")).upper(),
+        "probeMaxBytes": service_info_dict.get("probeMaxBytes", PROBE_STREAM_MAX_BYTES),
+    }
+
+
+def build_health_entry(
+    ssm_key, info, status, http_response_code, date=None, timings=None
+):
+    """
+    Build the health status entry for a probed service.
+
+    Parameters:
+    - ssm_key (str): SSM parameter name the service was registered under.
+    - info (dict): Parsed registration as returned by parse_service_info.
+    - status (str): HEALTHY or UNHEALTHY.
+    - http_response_code (int or str): HTTP status code, or "N/A" if the request failed.
+    - date (str): ISO timestamp of the check. Defaults to now.
+    - timings (dict): Optional probe timings in milliseconds: "total" plus any of
+      "dns", "connect", "tls" and "ttfb" that were measured.
+    """
+    check = {
+        "status": status,
+        "httpResponseCode": str(http_response_code),
+        "date": date or datetime.datetime.now().isoformat(),
+    }
+    if timings:
+        check["latencyMs"] = timings["total"]
+        phases = {phase: ms for phase, ms in timings.items() if phase != "total"}
+        if phases:
+            check["timingsMs"] = phases
+    return {
+        "componentName": info["componentName"],
+        "componentCategory": info["componentCategory"],
+        "componentType": info["componentType"],
+        "description": info["description"],
+        "ssmKey": ssm_key,
+        "healthCheckUrl": info["healthCheckUrl"],
+        "landingPageUrl": info["landingPageUrl"],
+        "healthChecks": [check],
+    }
+
+
+def timeout_health_entry(ssm_key, service_info):
+    """
+    Build the health status entry for a probe cancelled at the invocation deadline.
+    """
+    return build_health_entry(
+        ssm_key, parse_service_info(service_info), "TIMEOUT", "N/A"
+    )
+
+
+def _url_host_port(url):
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https"):
+        raise ValueError(f"Unsupported URL scheme: {url}")
+    return parts.hostname, parts.port or (443 if parts.scheme == "https" else 80)
+
+
+def probe_endpoint(info, headers):
+    """
+    Probe a health check URL with the component's probe method and return (status, http_response_code).
+
+    TCP probes report HEALTHY with no HTTP response code when the connection
+    opens. Exceptions propagate to the caller. Phase timings are recorded for
+    the probe running on this thread, see _probe_outcome.
+
+    Parameters:
+    - info (dict): Parsed registration as returned by parse_service_info.
+    - headers (dict): HTTP headers to send with the health check request.
+    """
+    url = info["healthCheckUrl"]
+    method = info["probeMethod"]
+    if method not in PROBE_METHODS:
+        logger.warning("Unknown probeMethod %s for %s, using GET", method, url)
+        method = "GET"
+    timeout = (PROBE_CONNECT_TIMEOUT_SECONDS, PROBE_READ_TIMEOUT_SECONDS)
+
+    if method == "TCP":
+        host, port = _url_host_port(url)
+        start = time.perf_counter()
+        addresses = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        _record_probe_timing("dns", time.perf_counter() - start)
+        start = time.perf_counter()
+        for *_, sockaddr in addresses:
+            try:
+                socket.create_connection(
+                    sockaddr[:2], timeout=PROBE_CONNECT_TIMEOUT_SECONDS
+                ).close()
+                break
+            except OSError as e:
+                error = e
+        else:
+            raise error
+        _record_probe_timing("connect", time.perf_counter() - start)
+        return "HEALTHY", "N/A"
+
+    session = get_http_session()
+    if method == "HEAD":
+        response = session.head(
+            url, headers=headers, timeout=timeout, allow_redirects=True
+        )
+    elif method == "STREAM":
+        with session.get(
+            url, headers=headers, timeout=timeout, stream=True
+        ) as response:
+            max_bytes = int(info["probeMaxBytes"])
+            if max_bytes > 0:
+                response.raw.read(max_bytes)
+    else:
+        response = session.get(url, headers=headers, timeout=timeout)
+
+    status = "HEALTHY" if response.status_code == 200 else "UNHEALTHY"
+    return status, response.status_code
+
+
+def _probe_outcome(info, headers):
+    # (status, http_response_code, date, timings) for one probe, with errors reported
+    timings = _probe_timings.current = {}
+    start = time.perf_counter()
+    try:
+        status, http_response_code = probe_endpoint(info, headers)
+    except Exception as e:
+        status = "UNHEALTHY"
+        http_response_code = "N/A"
+        logger.warning("Error accessing %s: %s", info["healthCheckUrl"], e)
+    finally:
+        _probe_timings.current = None
+    timings["total"] = round((time.perf_counter() - start) * 1000, 3)
+    metrics.add("ProbeLatency", timings["total"])
+    return status, http_response_code, datetime.datetime.now().isoformat(), timings
+
+
+class ProbeCoalescer:
+    """
+    Probes each unique health check once per run and shares the outcome with every registration that uses it.
+
+    Registrations coalesce when they have the same healthCheckUrl, probe
+    method, body cap and Authorization header.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._outcomes = {}
+        self.registrations = 0
+
+    @staticmethod
+    def _key(info, headers):
+        return (
+            info["healthCheckUrl"],
+            info["probeMethod"],
+            str(info["probeMaxBytes"]) if info["probeMethod"] == "STREAM" else None,
+            headers.get("Authorization"),
+        )
+
+    def _claim(self, key, new_future):
+        # Returns the stored outcome tuple, or a future and whether the caller
+        # is the leader that has to resolve it
+        with self._lock:
+            self.registrations += 1
+            if key in self._outcomes:
+                return self._outcomes[key], False
+            future = self._outcomes[key] = new_future()
+            return future, True
+
+    def _settle(self, key, outcome):
+        # A future holds its own condition and lock; once resolved, only the
+        # outcome is kept for registrations that arrive later
+        with self._lock:
+            self._outcomes[key] = outcome
+
+    def probe(self, info, headers):
+        """
+        Return (status, http_response_code, date, timings), probing only if no other registration has claimed the same check.
+        """
+        key = self._key(info, headers)
+        claimed, leader = self._claim(key, Future)
+        if isinstance(claimed, tuple):
+            return claimed
+        if leader:
+            outcome = _probe_outcome(info, headers)
+            claimed.set_result(outcome)
+            self._settle(key, outcome)
+            return outcome
+        return claimed.result()
+
+    async def probe_async(self, info, headers, probe):
+        """
+        Event loop variant of probe; probe is a coroutine function returning the same tuple.
+        """
+        key = self._key(info, headers)
+        claimed, leader = self._claim(key, asyncio.get_running_loop().create_future)
+        if isinstance(claimed, tuple):
+            return claimed
+        if leader:
+            try:
+                outcome = await probe()
+            except asyncio.CancelledError:
+                claimed.cancel()
+                raise
+            except BaseException as e:
+                claimed.set_exception(e)
+                raise
+            claimed.set_result(outcome)
+            self._settle(key, outcome)
+            return outcome
+        # Shield so that cancelling one registration does not cancel the others
+        return await asyncio.shield(claimed)
+
+    def stats(self):
+        """
+        Return the number of registrations, unique probes and their ratio for this run.
+        """
+        with self._lock:
+            probes = len(self._outcomes)
+            registrations = self.registrations
+        return {
+            "registrations": registrations,
+            "probes": probes,
+            "coalescingRatio": round(registrations / probes, 3) if probes else 1.0,
+        }
+
+
+def probe_service(ssm_key, service_info, headers, coalescer=None):
+    """
+    Probe a single service and build its health status entry.
+
+    Parameters:
+    - ssm_key (str): SSM parameter name the service was registered under.
+    - service_info (str): JSON registration document stored in SSM.
+    - headers (dict): HTTP headers to send with the health check request.
+    - coalescer (ProbeCoalescer): Optional coalescer shared by the run's probes.
+    """
+    info = parse_service_info(service_info)
+    if coalescer is not None:
+        outcome = coalescer.probe(info, headers)
+    else:
+        outcome = _probe_outcome(info, headers)
+
+    return build_health_entry(ssm_key, info, *outcome)
+
+
+def check_service_health(
+    service_infos, access_token, max_workers=None, deadline=None, coalescer=None
+):
+    """
+    Check the health status of each service by making HTTP requests with the appropriate authorization headers.
+
+    Probes run concurrently on a bounded thread pool through StreamingProber,
+    the same engine the handler uses; the returned services keep the iteration
+    order of service_infos.
+
+    Parameters:
+    - service_infos (dict): Dictionary mapping service names to their details.
+    - access_token (str): Access token for authentication.
+    - max_workers (int): Maximum number of concurrent probes. Defaults to PROBE_MAX_WORKERS.
+    - deadline (float): Optional time.monotonic() value; probes unfinished by then are recorded as TIMEOUT.
+    - coalescer (ProbeCoalescer): Shares probes between registrations of the same check.
+      Defaults to a new coalescer when PROBE_COALESCING is enabled.
+    """
+    max_workers = max(1, max_workers or PROBE_MAX_WORKERS)
+    if not service_infos:
+        return {"services": []}
+
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(service_infos)))
+    try:
+        prober = StreamingProber(executor, coalescer=coalescer)
+        prober.set_access_token(access_token)
+        return prober.collect([("services", service_infos)], deadline)
+    finally:
+        # Do not wait for probes abandoned at the deadline
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+class StreamingProber:
+    """
+    Submits probes to a thread pool as component registrations arrive.
+
+    Registrations that arrive before the access token is known are held until
+    set_access_token is called. Results are read either in registration order
+    with collect, or in completion order with iter_completed when ordered is
+    False. In unordered mode at most max_in_flight probes are running or
+    waiting to be consumed at a time, and nothing is retained once it has been
+    yielded. Only the coalescer keeps one outcome per unique health check.
+    At most max_in_flight more registrations are queued behind them; add then
+    blocks, holding back the SSM fetch that calls it until the reader catches
+    up. Registrations added before set_access_token are all held.
+    """
+
+    def __init__(self, executor, ordered=True, max_in_flight=None, coalescer=None):
+        self._executor = executor
+        if coalescer is None and PROBE_COALESCING:
+            coalescer = ProbeCoalescer()
+        self.coalescer = coalescer
+        self.ordered = ordered
+        self._max_in_flight = max_in_flight or 2 * PROBE_MAX_WORKERS
+        # Reentrant because done callbacks may run inline while submitting
+        self._condition = threading.Condition(threading.RLock())
+        self._headers = None
+        self._pending = []
+        self._futures = {}
+        # Ordered mode: every registration added, by source, for received
+        self._added = {}
+        self._waiting = deque()
+        self._running = {}
+        self._completed = deque()
+        self._submitted = 0
+        self._in_flight = 0
+        self._draining = False
+        self._closed = False
+
+    def _submit(self, source, ssm_key, service_info):
+        self._submitted += 1
+        if self.ordered:
+            self._futures[(source, ssm_key)] = self._executor.submit(
+                probe_service, ssm_key, service_info, self._headers, self.coalescer
+            )
+        else:
+            self._waiting.append((ssm_key, service_info))
+            self._drain()
+
+    def _drain(self):
+        # Done callbacks can run inline from add_done_callback; the outer loop
+        # picks up their freed slots instead of recursing
+        if self._draining:
+            return
+        self._draining = True
+        try:
+            while self._waiting and self._in_flight < self._max_in_flight:
+                ssm_key, service_info = self._waiting.popleft()
+                self._in_flight += 1
+                future = self._executor.submit(
+                    probe_service, ssm_key, service_info, self._headers, self.coalescer
+                )
+                self._running[future] = (ssm_key, service_info)
+                future.add_done_callback(self._on_done)
+        finally:
+            self._draining = False
+
+    def _on_done(self, future):
+        with self._condition:
+            self._completed.append(future)
+            self._condition.notify_all()
+
+    def set_access_token(self, access_token):
+        with self._condition:
+            self._headers = {"Authorization": f"Bearer {access_token}"}
+            pending, self._pending = self._pending, []
+            if self._closed:
+                return
+            for item in pending:
+                self._submit(*item)
+
+    def add(self, source, service_infos):
+        """
+        Queue probes for a batch of registrations.
+
+        Keys are not remembered in unordered mode, so each key must be added
+        once. Shared and local registrations live under different prefixes and
+        every SSM fetch returns a name once.
+
+        Parameters:
+        - source (str): Label of the registration set, e.g. "shared" or "local".
+        - service_infos (dict): Dictionary mapping SSM keys to registration documents.
+        """
+        with self._condition:
+            if self._closed:
+                return
+            if self.ordered:
+                self._added.setdefault(source, {}).update(service_infos)
+            for ssm_key, service_info in service_infos.items():
+                if self._headers is None:
+                    self._pending.append((source, ssm_key, service_info))
+                    continue
+                while (
+                    not self.ordered
+                    and len(self._waiting) >= self._max_in_flight
+                    and not self._closed
+                ):
+                    self._condition.wait()
+                if self._closed:
+                    return
+                self._submit(source, ssm_key, service_info)
+
+    def close(self):
+        """
+        Signal that no more registrations will be added.
+
+        Registrations still waiting for the access token are then never probed.
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def iter_completed(self, deadline=None):
+        """
+        Yield health status entries as probes finish, until close has been called and every probe has been yielded.
+
+        Once deadline passes, unfinished and not yet started probes are
+        cancelled and yielded as TIMEOUT entries.
+
+        Parameters:
+        - deadline (float): Optional time.monotonic() value.
+        """
+        yielded = 0
+        while True:
+            with self._condition:
+                while not self._completed and not (
+                    self._closed and yielded == self._submitted
+                ):
+                    remaining = time_remaining(deadline)
+                    if remaining == 0:
+                        break
+                    self._condition.wait(remaining)
+                if not self._completed:
+                    if self._closed and yielded == self._submitted:
+                        return
+                    expired = self._expire()
+                    break
+                future = self._completed.popleft()
+                del self._running[future]
+                # A probe holds its slot until its result has been consumed,
+                # so a slow reader also throttles new submissions
+                self._in_flight -= 1
+                self._drain()
+                # Wakes an add waiting for room in the queue
+                self._condition.notify_all()
+            yielded += 1
+            yield future.result()
+
+        for future, (ssm_key, service_info) in expired:
+            if future is not None and future.done() and not future.cancelled():
+                yield future.result()
+            else:
+                yield timeout_health_entry(ssm_key, service_info)
+
+    def _expire(self):
+        # Stop accepting work and hand back everything not yet yielded
+        self._closed = True
+        self._condition.notify_all()
+        expired = list(self._running.items())
+        for future, _ in expired:
+            future.cancel()
+        expired.extend((None, item) for item in self._waiting)
+        expired.extend((None, (ssm_key, info)) for _, ssm_key, info in self._pending)
+        self._running.clear()
+        self._waiting.clear()
+        self._completed.clear()
+        self._pending = []
+        return expired
+
+    def collect(self, sources, deadline=None):
+        """
+        Wait for the probes and return {"services": [...]} in merge order.
+
+        Registrations that were not added beforehand are submitted first. If
+        the access token was never set, nothing can be probed and every
+        registration without a probe is recorded as TIMEOUT.
+
+        Parameters:
+        - sources (list): (source, service_infos) pairs in merge order; later sources win for duplicate keys.
+        - deadline (float): Optional time.monotonic() value; probes unfinished by then are recorded as TIMEOUT.
+        """
+        combined = {}
+        for source, service_infos in sources:
+            for ssm_key, service_info in service_infos.items():
+                combined[ssm_key] = (source, service_info)
+
+        with self._condition:
+            if self._headers is not None:
+                for ssm_key, (source, service_info) in combined.items():
+                    if (source, ssm_key) not in self._futures:
+                        self._submit(source, ssm_key, service_info)
+
+        services = []
+        for ssm_key, (source, service_info) in combined.items():
+            future = self._futures.get((source, ssm_key))
+            if future is None:
+                services.append(timeout_health_entry(ssm_key, service_info))
+                continue
+            try:
+                services.append(future.result(timeout=time_remaining(deadline)))
+            except FutureTimeoutError:
+                future.cancel()
+                services.append(timeout_health_entry(ssm_key, service_info))
+        return {"services": services}
+
+    def received(self):
+        """
+        Return the registrations added so far in ordered mode, as (source, service_infos) pairs for collect.
+        """
+        with self._condition:
+            return [
+                (source, dict(service_infos))
+                for source, service_infos in self._added.items()
+            ]
+
+
+async def _async_open_connection(host, port, timings):
+    """
+    Resolve host and open a TCP connection to the first address that accepts, recording "dns" and "connect" in timings.
+    """
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    addresses = await asyncio.wait_for(
+        loop.getaddrinfo(host, port, type=socket.SOCK_STREAM),
+        PROBE_CONNECT_TIMEOUT_SECONDS,
+    )
+    timings["dns"] = round((time.perf_counter() - start) * 1000, 3)
+    start = time.perf_counter()
+    for *_, sockaddr in addresses:
+        try:
+            connection = await asyncio.wait_for(
+                asyncio.open_connection(*sockaddr[:2]), PROBE_CONNECT_TIMEOUT_SECONDS
+            )
+            break
+        except OSError as e:
+            error = e
+    else:
+        raise error
+    timings["connect"] = round((time.perf_counter() - start) * 1000, 3)
+    return connection
+
+
+async def _async_http_get_status(url, headers, ssl_context, method="GET"):
+    """
+    Issue a single HTTP/1.1 request on a fresh connection and return the status code, Location header and phase timings.
+
+    Only the status line and headers are read; the body is never downloaded.
+    Timings are in milliseconds for the "dns", "connect", "tls" (https only)
+    and "ttfb" phases.
+
+    Parameters:
+    - url (str): URL to request.
+    - headers (dict): HTTP headers to send with the request.
+    - ssl_context (ssl.SSLContext): Context used for https URLs.
+    - method (str): HTTP method, GET or HEAD.
+    """
+    parts = urlsplit(url)
+    host, port = _url_host_port(url)
+    path = parts.path or "/"
+    if parts.query:
+        path = f"{path}?{parts.query}"
+
+    timings = {}
+    reader, writer = await _async_open_connection(host, port, timings)
+    try:
+        if parts.scheme == "https":
+            start = time.perf_counter()
+            await asyncio.wait_for(
+                writer.start_tls(ssl_context, server_hostname=host),
+                PROBE_CONNECT_TIMEOUT_SECONDS,
+            )
+            timings["tls"] = round((time.perf_counter() - start) * 1000, 3)
+        lines = [
+            f"{method} {path} HTTP/1.1",
+            f"Host: {parts.netloc.rpartition('@')[2]}",
+            "Accept: */*",
+            "Connection: close",
+        ]
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        start = time.perf_counter()
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        await asyncio.wait_for(writer.drain(), PROBE_READ_TIMEOUT_SECONDS)
+
+        status_line = await asyncio.wait_for(
+            reader.readline(), PROBE_READ_TIMEOUT_SECONDS
+        )
+        timings["ttfb"] = round((time.perf_counter() - start) * 1000, 3)
+        status_code = int(status_line.split()[1])
+        location = None
+        while True:
+            line = await asyncio.wait_for(reader.readline(), PROBE_READ_TIMEOUT_SECONDS)
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.strip().lower() == "location":
+                location = value.strip()
+        return status_code, location, timings
+    finally:
+        writer.close()
+
+
+async def _async_probe_status(
+    url, headers, ssl_context, global_limit, host_limits, method="GET"
+):
+    """
+    Fetch the final status code for url, following redirects like requests.get does.
+
+    Returns (status_code, timings) with the phase timings of the last request;
+    status_code is None for a TCP probe whose connection opened.
+
+    Parameters:
+    - url (str): Health check URL.
+    - headers (dict): HTTP headers to send with the request.
+    - ssl_context (ssl.SSLContext): Context used for https URLs.
+    - global_limit (asyncio.Semaphore): Cap on connections open across all hosts.
+    - host_limits (dict): Per-host semaphores keyed by (scheme, netloc).
+    - method (str): Probe method from PROBE_METHODS.
+    """
+    # The async client never reads bodies, so STREAM behaves like GET
+    http_method = "HEAD" if method == "HEAD" else "GET"
+    for _ in range(MAX_REDIRECTS + 1):
+        parts = urlsplit(url)
+        host_key = (parts.scheme, parts.netloc)
+        if host_key not in host_limits:
+            host_limits[host_key] = asyncio.Semaphore(ASYNC_PROBE_MAX_PER_HOST)
+        # Wait for the host's slot first, so probes queued behind a busy host
+        # do not hold global slots that other hosts could use
+        async with host_limits[host_key], global_limit:
+            if method == "TCP":
+                timings = {}
+                _, writer = await _async_open_connection(*_url_host_port(url), timings)
+                writer.close()
+                return None, timings
+            status_code, location, timings = await _async_http_get_status(
+                url, headers, ssl_context, http_method
+            )
+        if status_code not in REDIRECT_CODES or not location:
+            return status_code, timings
+        next_url = urljoin(url, location)
+        # Like requests, do not forward credentials to a different host
+        if urlsplit(next_url).hostname != parts.hostname:
+            headers = {k: v for k, v in headers.items() if k.lower() != "authorization"}
+        url = next_url
+    raise RuntimeError(f"Exceeded {MAX_REDIRECTS} redirects")
+
+
+async def _async_probe_outcome(info, headers, ssl_context, global_limit, host_limits):
+    # Event loop counterpart of _probe_outcome
+    health_check_url = info["healthCheckUrl"]
+    method = info["probeMethod"]
+    if method not in PROBE_METHODS:
+        logger.warning(
+            "Unknown probeMethod %s for %s, using GET", method, health_check_url
+        )
+        method = "GET"
+
+    start = time.perf_counter()
+    timings = {}
+    try:
+        http_response_code, timings = await _async_probe_status(
+            health_check_url, headers, ssl_context, global_limit, host_limits, method
+        )
+        if http_response_code is None:
+            status, http_response_code = "HEALTHY", "N/A"
+        else:
+            status = "HEALTHY" if http_response_code == 200 else "UNHEALTHY"
+    except Exception as e:
+        status = "UNHEALTHY"
+        http_response_code = "N/A"
+        logger.warning("Error accessing %s: %s", health_check_url, e)
+    timings["total"] = round((time.perf_counter() - start) * 1000, 3)
+    metrics.add("ProbeLatency", timings["total"])
+
+    return status, http_response_code, datetime.datetime.now().isoformat(), timings
+
+
+async def _async_probe_service(
+    ssm_key, service_info, headers, ssl_context, global_limit, host_limits, coalescer
+):
+    """
+    Probe a single service on the event loop and build its health status entry.
+    """
+    info = parse_service_info(service_info)
+
+    def probe():
+        return _async_probe_outcome(
+            info, headers, ssl_context, global_limit, host_limits
+        )
+
+    if coalescer is not None:
+        outcome = await coalescer.probe_async(info, headers, probe)
+    else:
+        outcome = await probe()
+
+    return build_health_entry(ssm_key, info, *outcome)
+
+
+async def check_service_health_async(
+    service_infos, access_token, deadline=None, coalescer=None
+):
+    """
+    Check the health status of each service on a single asyncio event loop.
+
+    Produces the same structure as check_service_health. The number of open
+    connections is capped globally by ASYNC_PROBE_MAX_CONNECTIONS and per host
+    by ASYNC_PROBE_MAX_PER_HOST.
+
+    Parameters:
+    - service_infos (dict): Dictionary mapping service names to their details.
+    - access_token (str): Access token for authentication.
+    - deadline (float): Optional time.monotonic() value; probes unfinished by then are recorded as TIMEOUT.
+    - coalescer (ProbeCoalescer): Shares probes between registrations of the same check.
+      Defaults to a new coalescer when PROBE_COALESCING is enabled.
+    """
+    if coalescer is None and PROBE_COALESCING:
+        coalescer = ProbeCoalescer()
+    headers = {"Authorization": f"Bearer {access_token}"}
+    ssl_context = ssl.create_default_context()
+    global_limit = asyncio.Semaphore(ASYNC_PROBE_MAX_CONNECTIONS)
+    host_limits = {}
+
+    items = list(service_infos.items())
+    if not items:
+        return {"services": []}
+
+    tasks = [
+        asyncio.ensure_future(
+            _async_probe_service(
+                ssm_key,
+                service_info,
+                headers,
+                ssl_context,
+                global_limit,
+                host_limits,
+                coalescer,
+            )
+        )
+        for ssm_key, service_info in items
+    ]
+    await asyncio.wait(tasks, timeout=time_remaining(deadline))
+
+    services = []
+    for task, (ssm_key, service_info) in zip(tasks, items):
+        if task.done() and not task.cancelled():
+            services.append(task.result())
+        else:
+            task.cancel()
+            services.append(timeout_health_entry(ssm_key, service_info))
+    return {"services": services}
+
+
+def dump_json(value, compact=None, serializer=None):
+    """
+    Serialise value to JSON bytes in the configured report style.
+
+    Parameters:
+    - value: JSON-serialisable value.
+    - compact (bool): Omit indentation and spaces. Defaults to REPORT_COMPACT.
+    - serializer (str): "auto" or "json". Defaults to REPORT_SERIALIZER.
+    """
+    compact = REPORT_COMPACT if compact is None else compact
+    serializer = serializer or REPORT_SERIALIZER
+    if not compact:
+        return json.dumps(value, indent=4).encode()
+    if serializer == "auto" and orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(",", ":")).encode()
+
+
+def write_health_status(services, fileobj, compact=None, serializer=None):
+    """
+    Serialise health status entries to fileobj as they are produced.
+
+    The output is byte-for-byte what dump_json({"services": [...]}) would
+    produce, without holding the list in memory. Returns the number of entries
+    written.
+
+    Parameters:
+    - services (iterable of dict): Health status entries.
+    - fileobj: Binary file object to write to.
+    - compact (bool): Omit indentation and spaces. Defaults to REPORT_COMPACT.
+    - serializer (str): "auto" or "json". Defaults to REPORT_SERIALIZER.
+    """
+    compact = REPORT_COMPACT if compact is None else compact
+    count = 0
+    if compact:
+        fileobj.write(b'{"services":[')
+        for entry in services:
+            if count:
+                fileobj.write(b",")
+            fileobj.write(dump_json(entry, True, serializer))
+            count += 1
+        fileobj.write(b"]}")
+        return count
+
+    fileobj.write(b'{\n    "services": [')
+    for entry in services:
+        separator = "\n" if count == 0 else ",\n"
+        fileobj.write(
+            (separator + textwrap.indent(json.dumps(entry, indent=4), " " * 8)).encode()
+        )
+        count += 1
+    fileobj.write(b"\n    ]\n}" if count else b"]\n}")
+    return count
+
+
+def encode_report(json_data, compact=None, compress=None, serializer=None):
+    """
+    Serialise a health report for upload and return (body, content_encoding).
+
+    Parameters:
+    - json_data (dict): Report to encode.
+    - compact (bool): Omit indentation and spaces. Defaults to REPORT_COMPACT.
+    - compress (bool): Gzip the body. Defaults to REPORT_GZIP.
+    - serializer (str): "auto" or "json". Defaults to REPORT_SERIALIZER.
+    """
+    body = dump_json(json_data, compact, serializer)
+    if REPORT_GZIP if compress is None else compress:
+        return gzip.compress(body, compresslevel=REPORT_GZIP_LEVEL, mtime=0), "gzip"
+    return body, None
+
+
+def upload_report_to_s3(body, bucket_name, object_name, content_encoding=None):
+    """
+    Upload a serialised health report to an S3 bucket and as health_check_latest.json.
+
+    Records the time of each request (ReportPutTime, LatestCopyTime or
+    LatestPutTime) and UploadBytes in the invocation metrics.
+
+    Parameters:
+    - body (str, bytes or file object): Serialised report. File objects are rewound before each upload.
+    - bucket_name (str): Bucket to upload to.
+    - object_name (str): S3 object name.
+    - content_encoding (str): Optional ContentEncoding of body, e.g. "gzip".
+    """
+    # Create an S3 client
+    s3_client = get_aws_client("s3")
+    extra_args = {"ContentEncoding": content_encoding} if content_encoding else {}
+
+    if hasattr(body, "seek"):
+        size = body.seek(0, os.SEEK_END)
+    else:
+        size = len(body.encode() if isinstance(body, str) else body)
+
+    def put(key, span):
+        if hasattr(body, "seek"):
+            body.seek(0)
+        with metrics.span(span):
+            s3_client.put_object(
+                Bucket=bucket_name,
+                Key=key,
+                Body=body,
+                ContentType="application/json",
+                **extra_args,
+            )
+        metrics.add("UploadBytes", size, "Bytes")
+
+    try:
+        if REPORT_LATEST_MODE == "copy":
+            put(object_name, "ReportPut")
+            try:
+                # Server-side copy keeps ContentType and ContentEncoding
+                with metrics.span("LatestCopy"):
+                    s3_client.copy_object(
+                        Bucket=bucket_name,
+                        Key=LATEST_REPORT_KEY,
+                        CopySource={"Bucket": bucket_name, "Key": object_name},
+                    )
+            except botocore.exceptions.ClientError as e:
+                logger.warning(
+                    "Copy to %s failed, uploading it instead: %s", LATEST_REPORT_KEY, e
+                )
+                put(LATEST_REPORT_KEY, "LatestPut")
+        elif hasattr(body, "read"):
+            put(object_name, "ReportPut")
+            put(LATEST_REPORT_KEY, "LatestPut")
+        else:
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                uploads = [
+                    executor.submit(put, object_name, "ReportPut"),
+                    executor.submit(put, LATEST_REPORT_KEY, "LatestPut"),
+                ]
+                for upload in uploads:
+                    upload.result()
+
+        return True, "JSON uploaded successfully."
+    except Exception as e:
+        # The upload failed; return False and the error
+        return False, str(e)
+
+
+def upload_json_to_s3(json_data, bucket_name, object_name):
+    """
+    Upload JSON data to an S3 bucket.
+
+    Parameters:
+    - json_data (dict): JSON data to upload.
+    - bucket_name (str): Bucket to upload to.
+    - object_name (str): S3 object name.
+    """
+    try:
+        # Encode as configured by REPORT_COMPACT, REPORT_GZIP and REPORT_SERIALIZER
+        body, content_encoding = encode_report(json_data)
+    except Exception as e:
+        return False, str(e)
+
+    return upload_report_to_s3(body, bucket_name, object_name, content_encoding)
+
+
+class HealthStateHash:
+    """
+    Order-independent hash of the status-relevant fields of health status entries.
+
+    Check dates and latencies are left out, so two runs hash the same when
+    every component kept its registration, status and response code,
+    whatever order the probes finished in.
+    """
+
+    def __init__(self):
+        self._digests = []
+
+    def update(self, entry):
+        """
+        Add a health status entry to the hash and return it.
+        """
+        check = entry["healthChecks"][0]
+        state = {key: value for key, value in entry.items() if key != "healthChecks"}
+        state["status"] = check["status"]
+        state["httpResponseCode"] = check["httpResponseCode"]
+        self._digests.append(
+            hashlib.sha256(json.dumps(state, sort_keys=True).encode()).digest()
+        )
+        return entry
+
+    def hexdigest(self):
+        digest = hashlib.sha256()
+        for entry_digest in sorted(self._digests):
+            digest.update(entry_digest)
+        return digest.hexdigest()
+
+
+# {"bucket", "hash", "report", "uploadedAt"} of the last uploaded snapshot;
+# loaded from REPORT_STATE_FILE on first use
+_report_state = None
+_report_state_loaded = False
+
+
+def _load_report_state():
+    global _report_state, _report_state_loaded
+    if _report_state_loaded:
+        return _report_state
+    _report_state_loaded = True
+    if not REPORT_STATE_FILE:
+        return None
+    try:
+        with open(REPORT_STATE_FILE) as f:
+            _report_state = json.load(f)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.error("Error reading report state file %s: %s", REPORT_STATE_FILE, e)
+    return _report_state
+
+
+def _save_report_state(state):
+    global _report_state
+    _report_state = state
+    if not REPORT_STATE_FILE:
+        return
+    try:
+        tmp_name = f"{REPORT_STATE_FILE}.tmp"
+        with open(tmp_name, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_name, REPORT_STATE_FILE)
+    except Exception as e:
+        logger.error("Error writing report state file %s: %s", REPORT_STATE_FILE, e)
+
+
+def unchanged_report(bucket_name, report_hash):
+    """
+    Return the key of the last uploaded snapshot if it has the same hash and is recent enough to reuse, else None.
+
+    Parameters:
+    - bucket_name (str): Bucket the snapshot would be uploaded to.
+    - report_hash (str): HealthStateHash digest of this run.
+    """
+    state = _load_report_state()
+    if (
+        state is None
+        or state["bucket"] != bucket_name
+        or state["hash"] != report_hash
+        or time.time() - state["uploadedAt"] >= REPORT_SNAPSHOT_MAX_AGE_SECONDS
+    ):
+        return None
+    return state["report"]
+
+
+def record_report_upload(bucket_name, report_hash, object_name):
+    """
+    Remember an uploaded snapshot for unchanged_report.
+    """
+    _save_report_state(
+        {
+            "bucket": bucket_name,
+            "hash": report_hash,
+            "report": object_name,
+            "uploadedAt": time.time(),
+        }
+    )
+
+
+def upload_heartbeat(bucket_name, report_hash, report_key, uploaded, service_count):
+    """
+    Upload REPORT_HEARTBEAT_KEY, recording that a run completed and which snapshot holds its statuses.
+
+    Parameters:
+    - bucket_name (str): Bucket to upload to.
+    - report_hash (str): HealthStateHash digest of this run.
+    - report_key (str): Key of the snapshot matching this run's statuses.
+    - uploaded (bool): Whether this run uploaded a new snapshot.
+    - service_count (int): Number of services checked.
+    """
+    heartbeat = {
+        "date": datetime.datetime.now().isoformat(),
+        "reportHash": report_hash,
+        "report": report_key,
+        "snapshotUploaded": uploaded,
+        "services": service_count,
+    }
+    try:
+        get_aws_client("s3").put_object(
+            Bucket=bucket_name,
+            Key=REPORT_HEARTBEAT_KEY,
+            Body=json.dumps(heartbeat, indent=4),
+            ContentType="application/json",
+        )
+        return True, "Heartbeat uploaded successfully."
+    except Exception as e:
+        return False, str(e)
+
+
+class HealthHistoryWriter:
+    """
+    Appends one NDJSON line per service check to the current history segment and uploads it to S3.
+
+    S3 objects cannot be appended to, so the segment is kept in HISTORY_DIR
+    and the whole file is uploaded on each flush. A segment that already
+    exists in S3 but not locally, for example after a cold start, is
+    downloaded first so earlier lines are kept.
+
+    Parameters:
+    - bucket_name (str): Bucket holding the segments.
+    - segment (str): "hourly" or "daily".
+    - directory (str): Local directory for the segment being written.
+    """
+
+    def __init__(self, bucket_name, segment=None, directory=None):
+        self.bucket_name = bucket_name
+        self.segment_format = HISTORY_SEGMENT_FORMATS[segment or HISTORY_SEGMENT]
+        self.directory = directory or HISTORY_DIR
+        self.segment_name = None
+        self.pending_bytes = 0
+        # None until the first upload, so the first run after a cold start
+        # uploads instead of waiting HISTORY_FLUSH_SECONDS
+        self.last_flush = None
+        self._file = None
+
+    def _path(self, name):
+        return os.path.join(self.directory, f"{name}.ndjson")
+
+    def _key(self, name):
+        return f"{HISTORY_PREFIX}/{name}.ndjson"
+
+    def _open_segment(self, name):
+        path = self._path(name)
+        if not os.path.exists(path):
+            os.makedirs(self.directory, exist_ok=True)
+            try:
+                response = get_aws_client("s3").get_object(
+                    Bucket=self.bucket_name, Key=self._key(name)
+                )
+                body = response["Body"].read()
+            except botocore.exceptions.ClientError as e:
+                if e.response["Error"]["Code"] != "NoSuchKey":
+                    raise
+                body = b""
+            with open(path, "wb") as f:
+                f.write(body)
+        self.segment_name = name
+
+    def start_run(self, now):
+        """
+        Open the segment for a run started at now, uploading and removing the previous segment on rollover.
+        """
+        name = now.strftime(self.segment_format)
+        if self.segment_name is not None and name != self.segment_name:
+            previous = self.segment_name
+            self.flush()
+            os.remove(self._path(previous))
+        if name != self.segment_name:
+            self._open_segment(name)
+        self._file = open(self._path(name), "ab")
+
+    def write(self, entry):
+        """
+        Append the latest check of a health status entry and return the entry.
+        """
+        check = entry["healthChecks"][0]
+        # "date" comes first so readers can filter lines without parsing them
+        record = {
+            "date": check["date"],
+            "ssmKey": entry["ssmKey"],
+            "componentName": entry["componentName"],
+            "status": check["status"],
+            "httpResponseCode": check["httpResponseCode"],
+        }
+        if "latencyMs" in check:
+            record["latencyMs"] = check["latencyMs"]
+        line = json.dumps(record, separators=(",", ":")).encode() + b"\n"
+        self._file.write(line)
+        self.pending_bytes += len(line)
+        return entry
+
+    def finish_run(self):
+        """
+        Close the segment and upload it if enough lines or time have accumulated.
+        """
+        self._file.close()
+        self._file = None
+        if (
+            self.last_flush is None
+            or self.pending_bytes >= HISTORY_FLUSH_BYTES
+            or time.monotonic() - self.last_flush >= HISTORY_FLUSH_SECONDS
+        ):
+            self.flush()
+
+    def flush(self):
+        """
+        Upload the current segment to S3.
+        """
+        with open(self._path(self.segment_name), "rb") as f:
+            get_aws_client("s3").put_object(
+                Bucket=self.bucket_name,
+                Key=self._key(self.segment_name),
+                Body=f,
+                ContentType="application/x-ndjson",
+            )
+        self.pending_bytes = 0
+        self.last_flush = time.monotonic()
+
+
+# History writers by bucket, kept across warm invocations
+_history_writers = {}
+
+
+def get_history_writer(bucket_name):
+    """
+    Return the history writer for bucket_name, creating it on first use.
+    """
+    if bucket_name not in _history_writers:
+        _history_writers[bucket_name] = HealthHistoryWriter(bucket_name)
+    return _history_writers[bucket_name]
+
+
+def iter_health_history(directory, start=None, end=None):
+    """
+    Stream history records with start <= date < end from the NDJSON segments in directory, oldest first.
+
+    Segments are selected by file name, so only those overlapping the range
+    are opened, and only lines whose date is in range are parsed. The
+    directory can be a local copy of HISTORY_PREFIX, e.g. from aws s3 sync.
+
+    Parameters:
+    - directory (str): Directory holding <period>.ndjson segments.
+    - start (datetime or str): Inclusive lower bound. Defaults to no bound.
+    - end (datetime or str): Exclusive upper bound. Defaults to no bound.
+    """
+    start = start.isoformat() if isinstance(start, datetime.datetime) else start
+    end = end.isoformat() if isinstance(end, datetime.datetime) else end
+
+    segments = []
+    for file_name in os.listdir(directory):
+        name, extension = os.path.splitext(file_name)
+        if extension != ".ndjson":
+            continue
+        for segment_format, length in (
+            ("%Y-%m-%dT%H", datetime.timedelta(hours=1)),
+            ("%Y-%m-%d", datetime.timedelta(days=1)),
+        ):
+            try:
+                segment_start = datetime.datetime.strptime(name, segment_format)
+            except ValueError:
+                continue
+            segment_end = segment_start + length
+            if (start is None or segment_end.isoformat() > start) and (
+                end is None or segment_start.isoformat() < end
+            ):
+                segments.append((segment_start, file_name))
+            break
+
+    prefix = b'{"date":"'
+    for _, file_name in sorted(segments):
+        with open(os.path.join(directory, file_name), "rb") as f:
+            for line in f:
+                if line.startswith(prefix):
+                    date = line[len(prefix) : line.index(b'"', len(prefix))].decode()
+                    if (start is not None and date < start) or (
+                        end is not None and date >= end
+                    ):
+                        continue
+                yield json.loads(line)
+
+
+def read_json_object(bucket_name, key):
+    """
+    Return the JSON document stored at key, or None if there is none to restore.
+
+    A missing object and one that is not valid JSON both return None. Any
+    other error is raised, so state that could not be read is never taken
+    for empty state and overwritten. S3 reports a missing key as NoSuchKey
+    only to roles allowed s3:ListBucket on the bucket, and as AccessDenied
+    otherwise.
+
+    Parameters:
+    - bucket_name (str): Bucket holding the object.
+    - key (str): Object key.
+    """
+    try:
+        response = get_aws_client("s3").get_object(Bucket=bucket_name, Key=key)
+    except botocore.exceptions.ClientError as e:
+        if e.response["Error"]["Code"] == "NoSuchKey":
+            return None
+        raise
+    body = response["Body"].read()
+    try:
+        return json.loads(body)
+    except ValueError as e:
+        logger.error("Ignoring unreadable %s: %s", key, e)
+        return None
+
+
+# Latency histogram window kept across warm invocations: {"windowStart": ISO
+# timestamp, "components": {componentName: LatencyHistogram}}
+_latency_histograms = None
+
+
+def load_latency_histograms(bucket_name):
+    """
+    Return the current latency histogram window, reading it from S3 on a cold start.
+
+    A window older than LATENCY_HISTOGRAM_WINDOW_SECONDS, or one stored with a
+    different LATENCY_HISTOGRAM_SUB_BUCKETS, is replaced with an empty one.
+    Returns None if the stored window could not be read; the read is retried
+    on the next invocation.
+
+    Parameters:
+    - bucket_name (str): Bucket holding LATENCY_HISTOGRAM_OBJECT.
+    """
+    global _latency_histograms
+    if _latency_histograms is None:
+        try:
+            document = read_json_object(bucket_name, LATENCY_HISTOGRAM_OBJECT)
+        except Exception as e:
+            logger.error("Error reading latency histograms: %s", e)
+            return None
+        if document and document["subBuckets"] == LATENCY_HISTOGRAM_SUB_BUCKETS:
+            _latency_histograms = {
+                "windowStart": document["windowStart"],
+                "components": {
+                    name: LatencyHistogram.from_dict(data)
+                    for name, data in document["components"].items()
+                },
+            }
+
+    now = datetime.datetime.now()
+    if (
+        _latency_histograms is None
+        or (
+            now - datetime.datetime.fromisoformat(_latency_histograms["windowStart"])
+        ).total_seconds()
+        > LATENCY_HISTOGRAM_WINDOW_SECONDS
+    ):
+        _latency_histograms = {"windowStart": now.isoformat(), "components": {}}
+    return _latency_histograms
+
+
+def record_latency(histograms, entry):
+    """
+    Add the latest probe latency of a health status entry to its component's histogram and return the entry.
+
+    Probes that failed without a response are not recorded, so connection
+    timeouts do not distort the latency distribution.
+
+    Parameters:
+    - histograms (dict): Window returned by load_latency_histograms.
+    - entry (dict): Health status entry.
+    """
+    check = entry["healthChecks"][0]
+    if "latencyMs" in check and (
+        check["status"] == "HEALTHY" or check["httpResponseCode"] != "N/A"
+    ):
+        components = histograms["components"]
+        name = entry["componentName"]
+        if name not in components:
+            components[name] = LatencyHistogram()
+        components[name].record(check["latencyMs"])
+    return entry
+
+
+def upload_latency_histograms(histograms, bucket_name):
+    """
+    Upload the latency histogram window to LATENCY_HISTOGRAM_OBJECT.
+
+    Parameters:
+    - histograms (dict): Window returned by load_latency_histograms.
+    - bucket_name (str): Bucket to upload to.
+    """
+    document = {
+        "windowStart": histograms["windowStart"],
+        "updated": datetime.datetime.now().isoformat(),
+        "subBuckets": LATENCY_HISTOGRAM_SUB_BUCKETS,
+        "components": {
+            name: histogram.to_dict()
+            for name, histogram in sorted(histograms["components"].items())
+        },
+    }
+    try:
+        get_aws_client("s3").put_object(
+            Bucket=bucket_name,
+            Key=LATENCY_HISTOGRAM_OBJECT,
+            Body=json.dumps(document, separators=(",", ":")),
+            ContentType="application/json",
+        )
+        return True, "Latency histograms uploaded successfully."
+    except Exception as e:
+        return False, str(e)
+
+
+# Uptime rollups kept across warm invocations: {componentName: UptimeRollup}
+_uptime_rollups = None
+
+
+def load_uptime_rollups(bucket_name):
+    """
+    Return the uptime rollups, reading them from UPTIME_STATE_OBJECT on a cold start.
+
+    Returns None if the stored state could not be read, so the run neither
+    counts nor uploads rollups; the read is retried on the next invocation.
+
+    Parameters:
+    - bucket_name (str): Bucket holding UPTIME_STATE_OBJECT.
+    """
+    global _uptime_rollups
+    if _uptime_rollups is None:
+        try:
+            document = read_json_object(bucket_name, UPTIME_STATE_OBJECT)
+        except Exception as e:
+            logger.error("Error reading uptime rollups: %s", e)
+            return None
+        _uptime_rollups = {
+            name: UptimeRollup.from_dict(data)
+            for name, data in (document or {"components": {}})["components"].items()
+        }
+    return _uptime_rollups
+
+
+def record_uptime(rollups, entry):
+    """
+    Count the latest check of a health status entry in its component's rollup and return the entry.
+
+    Parameters:
+    - rollups (dict): Rollups returned by load_uptime_rollups.
+    - entry (dict): Health status entry.
+    """
+    check = entry["healthChecks"][0]
+    name = entry["componentName"]
+    if name not in rollups:
+        rollups[name] = UptimeRollup()
+    rollups[name].record(check["date"], check["status"])
+    return entry
+
+
+def upload_uptime_rollups(rollups, bucket_name):
+    """
+    Upload the uptime summary to UPTIME_OBJECT and the rollup state to UPTIME_STATE_OBJECT.
+
+    Components with no check in any window are dropped first.
+
+    Parameters:
+    - rollups (dict): Rollups returned by load_uptime_rollups.
+    - bucket_name (str): Bucket to upload to.
+    """
+    now = datetime.datetime.now()
+    for name in [name for name, rollup in rollups.items() if not rollup.prune(now)]:
+        del rollups[name]
+    components = sorted(rollups.items())
+    summary = {
+        "updated": now.isoformat(),
+        "components": {name: rollup.summary(now) for name, rollup in components},
+    }
+    state = {
+        "updated": now.isoformat(),
+        "components": {name: rollup.to_dict() for name, rollup in components},
+    }
+    try:
+        s3_client = get_aws_client("s3")
+        # The state goes first, so the summary never reflects counts a cold
+        # start could not restore
+        for key, document in ((UPTIME_STATE_OBJECT, state), (UPTIME_OBJECT, summary)):
+            s3_client.put_object(
+                Bucket=bucket_name,
+                Key=key,
+                Body=json.dumps(document, separators=(",", ":")),
+                ContentType="application/json",
+            )
+        return True, "Uptime rollups uploaded successfully."
+    except Exception as e:
+        return False, str(e)
+
+
+class CheckWindows:
+    """
+    Ring buffers of the last checks of each registration, newest first, keyed by SSM key.
+    """
+
+    def __init__(self, size=None):
+        self.size = size or CHECK_WINDOW_SIZE
+        self.windows = {}
+        self.seen = set()
+
+    def start_run(self):
+        self.seen = set()
+
+    def record(self, entry):
+        """
+        Add the entry's check to its registration's window, list the window in the entry and return it.
+        """
+        key = entry["ssmKey"]
+        window = self.windows.get(key)
+        if window is None:
+            window = self.windows[key] = deque(maxlen=self.size)
+        # Newest first; the oldest check falls off the end
+        window.extendleft(entry["healthChecks"])
+        entry["healthChecks"] = list(window)
+        self.seen.add(key)
+        return entry
+
+    def to_dict(self):
+        # Registrations missing from the last run were removed from SSM
+        return {
+            "size": self.size,
+            "services": {
+                key: list(window)
+                for key, window in sorted(self.windows.items())
+                if key in self.seen
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data, size=None):
+        windows = cls(size)
+        windows.windows = {
+            key: deque(checks[: windows.size], maxlen=windows.size)
+            for key, checks in data["services"].items()
+        }
+        return windows
+
+
+# Check windows kept across warm invocations
+_check_windows = None
+
+
+def load_check_windows(bucket_name):
+    """
+    Return the check windows, reading them from CHECK_WINDOW_OBJECT on a cold start.
+
+    Returns None if the stored windows could not be read, so the run lists
+    only the current checks and uploads no windows; the read is retried on
+    the next invocation.
+
+    Parameters:
+    - bucket_name (str): Bucket holding CHECK_WINDOW_OBJECT.
+    """
+    global _check_windows
+    if _check_windows is None:
+        try:
+            document = read_json_object(bucket_name, CHECK_WINDOW_OBJECT)
+        except Exception as e:
+            logger.error("Error reading check windows: %s", e)
+            return None
+        _check_windows = (
+            CheckWindows.from_dict(document) if document else CheckWindows()
+        )
+    return _check_windows
+
+
+def upload_check_windows(windows, bucket_name):
+    """
+    Upload the check windows of the registrations seen in this run to CHECK_WINDOW_OBJECT.
+
+    Parameters:
+    - windows (CheckWindows): Windows returned by load_check_windows.
+    - bucket_name (str): Bucket to upload to.
+    """
+    try:
+        get_aws_client("s3").put_object(
+            Bucket=bucket_name,
+            Key=CHECK_WINDOW_OBJECT,
+            Body=json.dumps(windows.to_dict(), separators=(",", ":")),
+            ContentType="application/json",
+        )
+        return True, "Check windows uploaded successfully."
+    except Exception as e:
+        return False, str(e)
+
+
+def run_task_graph(tasks):
+    """
+    Run tasks concurrently, starting each one as soon as the tasks it depends on have finished.
+
+    Returns a dictionary mapping task names to their results. An exception
+    raised by a task is re-raised once the running tasks have finished.
+
+    Parameters:
+    - tasks (dict): Maps task names to (callable, list of dependency names). Each callable is
+      called with the results of its dependencies as keyword arguments.
+    """
+    results = {}
+    pending = dict(tasks)
+    running = {}
+    with ThreadPoolExecutor(max_workers=max(1, len(tasks))) as executor:
+        while pending or running:
+            for name, (func, dependencies) in list(pending.items()):
+                if all(dependency in results for dependency in dependencies):
+                    kwargs = {
+                        dependency: results[dependency] for dependency in dependencies
+                    }
+                    running[executor.submit(func, **kwargs)] = name
+                    del pending[name]
+            if not running:
+                raise ValueError(f"Unsatisfiable task dependencies: {sorted(pending)}")
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future)] = future.result()
+    return results
+
+
+SHARED_PARAMETERS_COGNITO = [
+    "/unity/shared-services/cognito/monitoring-username",
+    "/unity/shared-services/cognito/monitoring-password",
+    "/unity/shared-services/dapa/client-id",
+]
+
+
+def gather_health_info(project, venue, prober=None):
+    """
+    Fetch the Cognito token and the shared and local component registrations concurrently.
+
+    Returns a dictionary with the cognito_info, token, shared_components and
+    local_components results, the last two being registration counts. Unless
+    prober is unordered, it also holds the registrations themselves as
+    shared_services_health_info and local_health_info; an unordered prober
+    is their only consumer, so they are not kept.
+
+    Parameters:
+    - project (string): Name of project
+    - venue (string): Name of venue
+    - prober (StreamingProber): Optional prober that receives registrations and the token as they arrive.
+    """
+    keep_values = prober is None or prober.ordered
+    counts_lock = threading.Lock()
+
+    def fetch_registrations(shared, source):
+        count = 0
+
+        def on_values(values):
+            nonlocal count
+            with counts_lock:
+                count += len(values)
+            prober.add(source, values)
+
+        registrations = fetch_health_status_ssm_parameters(
+            shared,
+            project,
+            venue,
+            on_values=on_values if prober is not None else None,
+            keep_values=keep_values,
+        )
+        return registrations if keep_values else count
+
+    def fetch_cognito_info():
+        with metrics.span("SharedParameterFetch"):
+            return get_ssm_parameter_value(SHARED_PARAMETERS_COGNITO, shared=True)
+
+    def fetch_token(cognito_info):
+        with metrics.span("Auth"):
+            token = create_cognito_client(cognito_info)
+        if prober is not None:
+            prober.set_access_token(token)
+        return token
+
+    results = run_task_graph(
+        {
+            # Fetch shared parameters
+            "cognito_info": (fetch_cognito_info, []),
+            "token": (fetch_token, ["cognito_info"]),
+            "shared_services_health_info": (
+                lambda: fetch_registrations(True, "shared"),
+                [],
+            ),
+            "local_health_info": (lambda: fetch_registrations(False, "local"), []),
+        }
+    )
+    for name, count_name in (
+        ("shared_services_health_info", "shared_components"),
+        ("local_health_info", "local_components"),
+    ):
+        if keep_values:
+            results[count_name] = len(results[name])
+        else:
+            results[count_name] = results.pop(name)
+    return results
+
+
+def lambda_handler(event, context):
+    """AWS Lambda function handler. Set LOG_LEVEL=DEBUG to log the full inputs and report."""
+    project = os.environ.get("PROJECT")
+    venue = os.environ.get("VENUE")
+
+    if event and event.get("invalidateSsmCache"):
+        invalidate_ssm_cache()
+
+    bucket_name = f"unity-{project}-{venue}-bucket"
+    logger.info(
+        "Starting health check run",
+        extra={
+            "fields": {
+                "project": project,
+                "venue": venue,
+                "bucket": bucket_name,
+                "botocoreVersion": botocore.__version__,
+            }
+        },
+    )
+
+    metrics.reset()
+    handler_start = time.perf_counter()
+
+    # Independent steps run concurrently; with threaded probing, each component
+    # is probed as soon as both its SSM value and the access token are available
+    async_probes = os.environ.get("PROBE_MODE", "threads") == "asyncio"
+    streaming = REPORT_STREAMING and not async_probes
+    deadline = deadline_from_context(context)
+    connection_stats_before = get_http_connection_stats()
+
+    now = datetime.datetime.now()
+    filename = now.strftime("health_check_%Y-%m-%d_%H-%M-%S.json")
+    state_hash = HealthStateHash() if REPORT_SKIP_UNCHANGED else None
+    history = None
+    if HEALTH_HISTORY:
+        try:
+            history = get_history_writer(bucket_name)
+            history.start_run(now)
+        except Exception as e:
+            logger.error("Error opening health history segment: %s", e)
+            history = None
+
+    # On a cold start the per-component state is read from S3; the reads run
+    # alongside SSM discovery and Cognito rather than before them
+    background_executor = ThreadPoolExecutor(max_workers=4)
+    state_loads = [
+        background_executor.submit(load, bucket_name) if enabled else None
+        for load, enabled in (
+            (load_latency_histograms, LATENCY_HISTOGRAMS),
+            (load_uptime_rollups, UPTIME_ROLLUPS),
+            (load_check_windows, CHECK_WINDOW_SIZE > 1),
+        )
+    ]
+
+    probe_executor = ThreadPoolExecutor(max_workers=PROBE_MAX_WORKERS)
+    try:
+        coalescer = ProbeCoalescer() if PROBE_COALESCING else None
+        prober = (
+            None
+            if async_probes
+            else StreamingProber(
+                probe_executor, ordered=not streaming, coalescer=coalescer
+            )
+        )
+        gather = background_executor.submit(gather_health_info, project, venue, prober)
+        if streaming:
+            gather.add_done_callback(lambda _: prober.close())
+
+        # The observers need the stored state, so wait for it before the first
+        # entry is consumed; probes keep running in the meantime. State not
+        # read by the deadline is left out of this run.
+        def loaded_state(load):
+            if load is None:
+                return None
+            try:
+                return load.result(timeout=time_remaining(deadline))
+            except FutureTimeoutError:
+                logger.error("Per-component state not read by the deadline")
+                return None
+
+        histograms, rollups, check_windows = map(loaded_state, state_loads)
+        if check_windows is not None:
+            check_windows.start_run()
+
+        # Called with every health status entry as soon as it is known. The
+        # check window goes first; the others only read the newest check.
+        observers = []
+        if check_windows is not None:
+            observers.append(check_windows.record)
+        if histograms is not None:
+            observers.append(lambda entry: record_latency(histograms, entry))
+        if state_hash is not None:
+            observers.append(state_hash.update)
+        if history is not None:
+            observers.append(history.write)
+        if rollups is not None:
+            observers.append(lambda entry: record_uptime(rollups, entry))
+
+        def observe(entry):
+            for observer in observers:
+                observer(entry)
+            return entry
+
+        if streaming:
+            # Serialise results as probes finish while SSM and Cognito
+            # steps are still running in the background
+            report = tempfile.SpooledTemporaryFile(max_size=REPORT_SPOOL_MAX_BYTES)
+            services = map(observe, prober.iter_completed(deadline))
+            # GzipFile.close writes the gzip trailer but leaves report open
+            sink = (
+                gzip.GzipFile(
+                    fileobj=report,
+                    mode="wb",
+                    compresslevel=REPORT_GZIP_LEVEL,
+                    mtime=0,
+                )
+                if REPORT_GZIP
+                else report
+            )
+            with metrics.span("Probing"):
+                service_count = write_health_status(services, sink)
+                if sink is not report:
+                    sink.close()
+        try:
+            results = gather.result(timeout=time_remaining(deadline))
+        except FutureTimeoutError:
+            # Report what is available; discovery keeps running unobserved
+            logger.error("Component discovery did not finish by the deadline")
+            results = None
+            if prober is not None:
+                prober.close()
+
+        if results is not None:
+            logger.info(
+                "Discovered components",
+                extra={
+                    "fields": {
+                        "sharedComponents": results["shared_components"],
+                        "localComponents": results["local_components"],
+                    }
+                },
+            )
+
+        # When streaming, the registrations went straight to the prober and
+        # were not kept
+        if not streaming and results is None:
+            # Registrations received before the deadline; the probes have had
+            # until then to finish
+            health_status = (
+                prober.collect(prober.received(), deadline)
+                if prober is not None
+                else {"services": []}
+            )
+        elif not streaming:
+            shared_services_health_info = results["shared_services_health_info"]
+            local_health_info = results["local_health_info"]
+            logger.debug(
+                "Component registrations",
+                extra={
+                    "fields": {
+                        "cognitoInfo": results["cognito_info"],
+                        "sharedServices": shared_services_health_info,
+                        "localServices": local_health_info,
+                    }
+                },
+            )
+
+            # Check the health status using the combined health information
+            with metrics.span("Probing"):
+                if async_probes:
+                    # Combine shared and local health information
+                    combined_health_info = {
+                        **shared_services_health_info,
+                        **local_health_info,
+                    }
+                    health_status = asyncio.run(
+                        check_service_health_async(
+                            combined_health_info, results["token"], deadline, coalescer
+                        )
+                    )
+                else:
+                    health_status = prober.collect(
+                        [
+                            ("shared", shared_services_health_info),
+                            ("local", local_health_info),
+                        ],
+                        deadline,
+                    )
+        if not streaming:
+            service_count = len(health_status["services"])
+            for entry in health_status["services"]:
+                observe(entry)
+    finally:
+        # Probes, discovery and state reads abandoned at the deadline must not
+        # hold up the upload
+        probe_executor.shutdown(wait=False, cancel_futures=True)
+        background_executor.shutdown(wait=False)
+
+    connection_stats = get_http_connection_stats()
+    connection_stats = {
+        name: connection_stats[name] - connection_stats_before[name]
+        for name in connection_stats
+    }
+    logger.info("HTTP connections", extra={"fields": connection_stats})
+    metrics.add("ConnectionsOpened", connection_stats["opened"], "Count")
+    metrics.add("ConnectionsReused", connection_stats["reused"], "Count")
+    if coalescer is not None:
+        coalescing_stats = coalescer.stats()
+        logger.info("Probe coalescing", extra={"fields": coalescing_stats})
+        metrics.add("ProbeCount", coalescing_stats["probes"], "Count")
+        metrics.add("CoalescingRatio", coalescing_stats["coalescingRatio"], "None")
+
+    # With REPORT_SKIP_UNCHANGED, reuse the last snapshot if nothing changed
+    report_hash = state_hash.hexdigest() if state_hash is not None else None
+    last_report = unchanged_report(bucket_name, report_hash) if report_hash else None
+    if report_hash:
+        metrics.add("UploadSkipped", int(last_report is not None), "Count")
+
+    if streaming:
+        # The full report only exists in the uploaded object
+        with report, metrics.span("Upload"):
+            if last_report:
+                upload_status = True
+                upload_message = f"Unchanged since {last_report}, upload skipped."
+            else:
+                upload_status, upload_message = upload_report_to_s3(
+                    report, bucket_name, filename, "gzip" if REPORT_GZIP else None
+                )
+        body = {
+            "report": f"s3://{bucket_name}/{last_report or filename}",
+            "services": service_count,
+        }
+    else:
+        logger.debug("Health status", extra={"fields": health_status})
+
+        # Upload the JSON data to S3
+        with metrics.span("Upload"):
+            if last_report:
+                upload_status = True
+                upload_message = f"Unchanged since {last_report}, upload skipped."
+            else:
+                upload_status, upload_message = upload_json_to_s3(
+                    health_status, bucket_name, filename
+                )
+        body = health_status
+    if upload_status:
+        logger.info("Upload status: %s", upload_message)
+    else:
+        logger.error("Upload status: %s", upload_message)
+
+    if report_hash is not None:
+        if upload_status and not last_report:
+            record_report_upload(bucket_name, report_hash, filename)
+        heartbeat_status, heartbeat_message = upload_heartbeat(
+            bucket_name,
+            report_hash,
+            last_report or filename,
+            not last_report,
+            service_count,
+        )
+        if not heartbeat_status:
+            logger.error("Error uploading heartbeat: %s", heartbeat_message)
+
+    if history is not None:
+        try:
+            history.finish_run()
+        except Exception as e:
+            logger.error("Error writing health history: %s", e)
+
+    # The state objects are independent, so they are uploaded concurrently
+    state_uploads = [
+        (name, upload, state)
+        for name, upload, state in (
+            ("latency histograms", upload_latency_histograms, histograms),
+            ("check windows", upload_check_windows, check_windows),
+            ("uptime rollups", upload_uptime_rollups, rollups),
+        )
+        if state is not None
+    ]
+    with ThreadPoolExecutor(max_workers=max(1, len(state_uploads))) as executor:
+        uploads = [
+            (name, executor.submit(upload, state, bucket_name))
+            for name, upload, state in state_uploads
+        ]
+    for name, upload in uploads:
+        state_status, state_message = upload.result()
+        if not state_status:
+            logger.error("Error uploading %s: %s", name, state_message)
+
+    metrics.add("TotalTime", (time.perf_counter() - handler_start) * 1000)
+    metrics.emit({"Project": project, "Venue": venue})
 
     # Output the result as JSON
     return {
         "statusCode": 200,
-        "body": json.dumps(health_status, indent=4),
+        "body": json.dumps(body, indent=4),
         "headers": {"Content-Type": "application/json"},
     }
 
@@ -37,6 +37,7 @@ resource "aws_iam_policy" "lambda_ssm_s3_policy" {
         Action = [
           "ssm:GetParameter",
           "ssm:GetParameters",
+          "ssm:GetParametersByPath",
           "ssm:PutParameter",
           "ssm:DescribeParameters"
         ],
@@ -50,6 +51,15 @@ resource "aws_iam_policy" "lambda_ssm_s3_policy" {
         ],
         Effect   = "Allow",
         Resource = "*"
+      },
+      {
+        # Lets reads of missing state and history objects fail with
+        # NoSuchKey rather than AccessDenied
+        Action = [
+          "s3:ListBucket"
+        ],
+        Effect   = "Allow",
+        Resource = "arn:aws:s3:::unity-${var.project}-${var.venue}-bucket"
       }
     ]
   })
@@ -0,0 +1,77 @@
+"""
+Makes lambda/lambda_function.py importable and keeps botocore from looking for
+real AWS credentials or a region.
+"""
+
+import os
+import sys
+
+LAMBDA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lambda")
+if LAMBDA_DIR not in sys.path:
+    sys.path.insert(0, LAMBDA_DIR)
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-west-2")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+
+for directory in ("benchmarks", "tools"):
+    directory = os.path.join(os.path.dirname(LAMBDA_DIR), directory)
+    if directory not in sys.path:
+        sys.path.append(directory)
+
+import pytest  # noqa: E402
+
+import fake_aws  # noqa: E402
+import lambda_function  # noqa: E402
+
+BUCKET = "unity-p-v-bucket"
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    """
+    In-memory S3 client returned by get_aws_client("s3") for the test.
+    """
+    client = fake_aws.FakeS3Client()
+    region = os.environ.get("AWS_REGION") or os.environ.get("AWS_DEFAULT_REGION")
+    monkeypatch.setitem(lambda_function._aws_clients, ("s3", region), client)
+    return client
+
+
+@pytest.fixture
+def ssm(monkeypatch):
+    """
+    Local fake SSM server used by get_aws_client("ssm") for the test; add
+    parameters to its parameters dict.
+    """
+    import botocore.session
+    from botocore.config import Config
+    from fake_ssm import FakeSSMServer
+
+    server = FakeSSMServer(fake_aws.shared_parameters()).start()
+    region = os.environ.get("AWS_REGION") or os.environ.get("AWS_DEFAULT_REGION")
+    session = botocore.session.get_session()
+    # The second client is the one get_aws_client("ssm", max_attempts=1)
+    # returns, used for GetParameters chunks
+    for key, config in (
+        (("ssm", region), None),
+        (("ssm", region, 1), Config(retries={"total_max_attempts": 1})),
+    ):
+        client = session.create_client(
+            "ssm", region_name=region, endpoint_url=server.endpoint_url, config=config
+        )
+        monkeypatch.setitem(lambda_function._aws_clients, key, client)
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def cognito(monkeypatch):
+    """
+    Fake Cognito client returned by get_aws_client("cognito-idp") for the test.
+    """
+    client = fake_aws.FakeCognitoClient()
+    region = os.environ.get("AWS_REGION") or os.environ.get("AWS_DEFAULT_REGION")
+    monkeypatch.setitem(lambda_function._aws_clients, ("cognito-idp", region), client)
+    monkeypatch.setattr(lambda_function, "_cognito_tokens", {})
+    return client
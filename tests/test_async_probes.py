@@ -0,0 +1,40 @@
+import asyncio
+
+import lambda_function
+
+
+def test_probes_queued_for_a_busy_host_do_not_hold_global_slots(monkeypatch):
+    in_flight = []
+    running_alongside = {}
+
+    async def fake_get_status(url, headers, ssl_context, method="GET"):
+        running_alongside[url] = list(in_flight)
+        in_flight.append(url)
+        await asyncio.sleep(0.01)
+        in_flight.remove(url)
+        return 200, None, {}
+
+    monkeypatch.setattr(lambda_function, "ASYNC_PROBE_MAX_PER_HOST", 1)
+    monkeypatch.setattr(lambda_function, "_async_http_get_status", fake_get_status)
+
+    async def probe_all():
+        global_limit = asyncio.Semaphore(2)
+        host_limits = {}
+        # Grouped by host, the order SSM returns registrations in
+        urls = [f"http://busy.example/{i}" for i in range(4)]
+        urls.append("http://idle.example/")
+        return await asyncio.gather(
+            *(
+                lambda_function._async_probe_status(
+                    url, {}, None, global_limit, host_limits
+                )
+                for url in urls
+            )
+        )
+
+    results = asyncio.run(probe_all())
+
+    assert [code for code, _ in results] == [200] * 5
+    # The idle host started next to the first busy probe instead of after
+    # the busy host's whole queue
+    assert running_alongside["http://idle.example/"] == ["http://busy.example/0"]
@@ -0,0 +1,69 @@
+import pytest
+
+import lambda_function
+from conftest import BUCKET
+from lambda_function import CheckWindows
+
+
+@pytest.fixture(autouse=True)
+def cold_start(monkeypatch):
+    monkeypatch.setattr(lambda_function, "_check_windows", None)
+
+
+def entry(ssm_key, status):
+    return {"ssmKey": ssm_key, "healthChecks": [{"status": status}]}
+
+
+def statuses(entry):
+    return [check["status"] for check in entry["healthChecks"]]
+
+
+def test_window_keeps_the_last_checks_newest_first():
+    windows = CheckWindows(size=3)
+    for status in ("A", "B", "C"):
+        windows.record(entry("/k", status))
+
+    assert statuses(windows.record(entry("/k", "D"))) == ["D", "C", "B"]
+
+
+def test_smaller_window_keeps_the_newest_stored_checks():
+    windows = CheckWindows(size=3)
+    for status in ("A", "B", "C"):
+        windows.record(entry("/k", status))
+
+    restored = CheckWindows.from_dict(windows.to_dict(), size=2)
+
+    assert statuses(restored.record(entry("/k", "D"))) == ["D", "C"]
+
+
+def test_only_registrations_seen_in_the_last_run_are_kept():
+    windows = CheckWindows(size=3)
+    windows.record(entry("/kept", "A"))
+    windows.record(entry("/removed", "A"))
+    windows.start_run()
+    windows.record(entry("/kept", "B"))
+
+    assert list(windows.to_dict()["services"]) == ["/kept"]
+
+
+def test_windows_are_restored_from_s3(s3):
+    windows = lambda_function.load_check_windows(BUCKET)
+    windows.record(entry("/k", "A"))
+    assert lambda_function.upload_check_windows(windows, BUCKET)[0]
+    lambda_function._check_windows = None
+
+    restored = lambda_function.load_check_windows(BUCKET)
+
+    assert statuses(restored.record(entry("/k", "B"))) == ["B", "A"]
+
+
+def test_failed_read_does_not_overwrite_stored_windows(s3):
+    windows = lambda_function.load_check_windows(BUCKET)
+    windows.record(entry("/k", "A"))
+    lambda_function.upload_check_windows(windows, BUCKET)
+    lambda_function._check_windows = None
+    s3.errors["GetObject"] = ["SlowDown"]
+
+    assert lambda_function.load_check_windows(BUCKET) is None
+    restored = lambda_function.load_check_windows(BUCKET)
+    assert statuses(restored.record(entry("/k", "B"))) == ["B", "A"]
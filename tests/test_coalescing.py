@@ -0,0 +1,144 @@
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import lambda_function
+from lambda_function import ProbeCoalescer, parse_service_info
+
+HEADERS = {"Authorization": "Bearer token-a"}
+
+
+def info(url="http://shared.example/health", **fields):
+    return parse_service_info(json.dumps({"healthCheckUrl": url, **fields}))
+
+
+@pytest.fixture
+def probed(monkeypatch):
+    """
+    URLs probe_endpoint was called with; each probe takes 50 ms.
+    """
+    calls = []
+    lock = threading.Lock()
+
+    def probe_endpoint(info, headers):
+        with lock:
+            calls.append(info["healthCheckUrl"])
+        time.sleep(0.05)
+        return "HEALTHY", 200
+
+    monkeypatch.setattr(lambda_function, "probe_endpoint", probe_endpoint)
+    return calls
+
+
+def test_duplicate_registrations_are_probed_once(probed):
+    coalescer = ProbeCoalescer()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        outcomes = list(
+            executor.map(lambda _: coalescer.probe(info(), HEADERS), range(4))
+        )
+    # A registration arriving after the probe finished reuses its outcome
+    outcomes.append(coalescer.probe(info(), HEADERS))
+
+    assert probed == ["http://shared.example/health"]
+    assert all(outcome == outcomes[0] for outcome in outcomes)
+    assert outcomes[0][:2] == ("HEALTHY", 200)
+    assert coalescer.stats() == {
+        "registrations": 5,
+        "probes": 1,
+        "coalescingRatio": 5.0,
+    }
+
+
+def test_different_authorization_or_probe_method_is_not_merged(probed):
+    coalescer = ProbeCoalescer()
+
+    coalescer.probe(info(), HEADERS)
+    coalescer.probe(info(), {"Authorization": "Bearer token-b"})
+    coalescer.probe(info(probeMethod="HEAD"), HEADERS)
+    coalescer.probe(info(probeMethod="STREAM", probeMaxBytes=10), HEADERS)
+    coalescer.probe(info(probeMethod="STREAM", probeMaxBytes=20), HEADERS)
+    coalescer.probe(info(), HEADERS)
+
+    assert len(probed) == 5
+    assert coalescer.stats() == {
+        "registrations": 6,
+        "probes": 5,
+        "coalescingRatio": 1.2,
+    }
+
+
+def test_ratio_without_registrations():
+    assert ProbeCoalescer().stats()["coalescingRatio"] == 1.0
+
+
+def test_async_duplicates_are_probed_once():
+    calls = []
+
+    async def probe():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "HEALTHY", 200, "2026-10-16T00:00:00", {"total": 10.0}
+
+    async def probe_all(coalescer):
+        return await asyncio.gather(
+            *(coalescer.probe_async(info(), HEADERS, probe) for _ in range(3)),
+            coalescer.probe_async(info("http://other.example/"), HEADERS, probe),
+        )
+
+    coalescer = ProbeCoalescer()
+    outcomes = asyncio.run(probe_all(coalescer))
+
+    assert len(calls) == 2
+    assert outcomes[0] == outcomes[1] == outcomes[2]
+    assert coalescer.stats()["coalescingRatio"] == 2.0
+
+
+def test_async_cancelling_a_follower_leaves_the_shared_probe_running():
+    async def probe():
+        await asyncio.sleep(0.02)
+        return "HEALTHY", 200, "2026-10-16T00:00:00", {}
+
+    async def run():
+        coalescer = ProbeCoalescer()
+        leader = asyncio.ensure_future(coalescer.probe_async(info(), HEADERS, probe))
+        followers = [
+            asyncio.ensure_future(coalescer.probe_async(info(), HEADERS, probe))
+            for _ in range(2)
+        ]
+        await asyncio.sleep(0)
+        followers[0].cancel()
+        return await asyncio.gather(leader, *followers, return_exceptions=True)
+
+    leader, cancelled, follower = asyncio.run(run())
+
+    assert isinstance(cancelled, asyncio.CancelledError)
+    assert leader == follower == ("HEALTHY", 200, "2026-10-16T00:00:00", {})
+
+
+def test_async_cancelling_the_leader_cancels_its_followers():
+    started = []
+
+    async def probe():
+        started.append(1)
+        await asyncio.sleep(10)
+
+    async def run():
+        coalescer = ProbeCoalescer()
+        tasks = [
+            asyncio.ensure_future(coalescer.probe_async(info(), HEADERS, probe))
+            for _ in range(3)
+        ]
+        await asyncio.sleep(0)
+        # As check_service_health_async does with probes left at the deadline
+        tasks[0].cancel()
+        await asyncio.wait(tasks, timeout=1)
+        return tasks
+
+    tasks = asyncio.run(run())
+
+    assert started == [1]
+    assert all(task.cancelled() for task in tasks)
@@ -0,0 +1,63 @@
+import pytest
+
+import fake_aws
+import lambda_function
+from lambda_function import create_cognito_client
+
+COGNITO_INFO = fake_aws.shared_parameters()
+
+
+@pytest.fixture(autouse=True)
+def secrets(monkeypatch):
+    monkeypatch.setattr(lambda_function, "_secrets", set())
+
+
+def test_token_is_reused_while_valid(cognito):
+    first = create_cognito_client(COGNITO_INFO)
+
+    assert create_cognito_client(COGNITO_INFO) == first
+    assert cognito.flows == ["USER_PASSWORD_AUTH"]
+
+
+def test_token_is_refreshed_inside_the_margin(cognito, monkeypatch):
+    monkeypatch.setattr(lambda_function, "COGNITO_TOKEN_REFRESH_MARGIN_SECONDS", 300)
+    cognito.expires_in = 299
+    first = create_cognito_client(COGNITO_INFO)
+
+    second = create_cognito_client(COGNITO_INFO)
+    # The refresh response has no refresh token; the cached one is kept
+    third = create_cognito_client(COGNITO_INFO)
+
+    assert len({first, second, third}) == 3
+    assert cognito.flows == [
+        "USER_PASSWORD_AUTH",
+        "REFRESH_TOKEN_AUTH",
+        "REFRESH_TOKEN_AUTH",
+    ]
+
+
+def test_failed_refresh_falls_back_to_password_auth(cognito):
+    cognito.expires_in = 0
+    create_cognito_client(COGNITO_INFO)
+    cognito.errors["REFRESH_TOKEN_AUTH"] = ["NotAuthorizedException"]
+
+    token = create_cognito_client(COGNITO_INFO)
+
+    assert token == "benchmark-access-token-3"
+    assert cognito.flows == [
+        "USER_PASSWORD_AUTH",
+        "REFRESH_TOKEN_AUTH",
+        "USER_PASSWORD_AUTH",
+    ]
+
+
+def test_tokens_are_cached_per_user(cognito):
+    create_cognito_client(COGNITO_INFO)
+    other_user = {
+        **COGNITO_INFO,
+        "/unity/shared-services/cognito/monitoring-username": "other",
+    }
+
+    create_cognito_client(other_user)
+
+    assert cognito.flows == ["USER_PASSWORD_AUTH", "USER_PASSWORD_AUTH"]
@@ -0,0 +1,129 @@
+import csv
+import datetime
+import gzip
+import json
+import os
+
+import pytest
+
+import export_columnar
+
+
+def write_snapshot(source, timestamp, statuses, compress=False):
+    date = datetime.datetime.strptime(timestamp, "%Y-%m-%d_%H-%M-%S").isoformat()
+    services = [
+        {
+            "componentName": name,
+            "componentCategory": "eng",
+            "componentType": "api",
+            # The current check first, then an older one already exported
+            "healthChecks": [
+                {"status": status, "httpResponseCode": "200", "date": date},
+                {"status": "OLD", "httpResponseCode": "500", "date": date},
+            ],
+        }
+        for name, status in statuses.items()
+    ]
+    body = json.dumps({"services": services}).encode()
+    if compress:
+        body = gzip.compress(body)
+    with open(os.path.join(source, f"health_check_{timestamp}.json"), "wb") as f:
+        f.write(body)
+
+
+def exported_rows(dest):
+    rows = []
+    for partition in sorted(os.listdir(dest)):
+        if not partition.startswith("date="):
+            continue
+        for part in sorted(os.listdir(os.path.join(dest, partition))):
+            with gzip.open(os.path.join(dest, partition, part), "rt") as f:
+                rows.extend(
+                    (partition, row["service"], row["status"], row["timestamp"])
+                    for row in csv.DictReader(f)
+                )
+    return rows
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    source, dest = tmp_path / "snapshots", tmp_path / "columnar"
+    source.mkdir()
+    return str(source), str(dest)
+
+
+def test_rows_are_partitioned_by_date_from_the_current_check(dirs):
+    source, dest = dirs
+    write_snapshot(source, "2026-10-15_23-55-00", {"a": "HEALTHY", "b": "UNHEALTHY"})
+    write_snapshot(source, "2026-10-16_00-00-00", {"a": "HEALTHY"}, compress=True)
+
+    assert export_columnar.export(source, dest, "csv") == (2, 3)
+
+    assert exported_rows(dest) == [
+        ("date=2026-10-15", "a", "HEALTHY", "2026-10-15T23:55:00"),
+        ("date=2026-10-15", "b", "UNHEALTHY", "2026-10-15T23:55:00"),
+        ("date=2026-10-16", "a", "HEALTHY", "2026-10-16T00:00:00"),
+    ]
+
+
+def test_only_snapshots_newer_than_the_watermark_are_exported(dirs):
+    source, dest = dirs
+    write_snapshot(source, "2026-10-16_00-00-00", {"a": "HEALTHY"})
+    export_columnar.export(source, dest, "csv")
+
+    assert export_columnar.export(source, dest, "csv") == (0, 0)
+
+    write_snapshot(source, "2026-10-16_00-05-00", {"a": "UNHEALTHY"})
+    assert export_columnar.export(source, dest, "csv") == (1, 1)
+    assert [row[2] for row in exported_rows(dest)] == ["HEALTHY", "UNHEALTHY"]
+    with open(os.path.join(dest, export_columnar.WATERMARK_FILE)) as f:
+        watermark = json.load(f)
+    assert watermark == {"lastSnapshot": "health_check_2026-10-16_00-05-00.json"}
+
+
+def test_interrupted_export_resumes_without_duplicates(dirs, monkeypatch):
+    source, dest = dirs
+    write_snapshot(source, "2026-10-14_12-00-00", {"a": "HEALTHY"})
+    write_snapshot(source, "2026-10-15_12-00-00", {"a": "HEALTHY"})
+    write_snapshot(source, "2026-10-16_12-00-00", {"a": "HEALTHY"})
+    write_csv = export_columnar.write_csv
+    written = []
+
+    def fail_on_second_date(rows, path):
+        if written:
+            raise OSError("disk full")
+        written.append(path)
+        return write_csv(rows, path)
+
+    monkeypatch.setitem(
+        export_columnar.WRITERS, "csv", (fail_on_second_date, ".csv.gz")
+    )
+    with pytest.raises(OSError):
+        export_columnar.export(source, dest, "csv")
+    monkeypatch.undo()
+
+    # The first date was kept and is not exported again
+    write_snapshot(source, "2026-10-16_12-05-00", {"a": "UNHEALTHY"})
+    assert export_columnar.export(source, dest, "csv") == (3, 3)
+
+    assert [row[0] for row in exported_rows(dest)] == [
+        "date=2026-10-14",
+        "date=2026-10-15",
+        "date=2026-10-16",
+        "date=2026-10-16",
+    ]
+
+
+def test_export_rerun_after_a_crash_rewrites_the_same_part(dirs, monkeypatch):
+    source, dest = dirs
+    write_snapshot(source, "2026-10-16_12-00-00", {"a": "HEALTHY"})
+    # Crash after the part file is in place but before the watermark moves
+    monkeypatch.setattr(export_columnar.json, "dump", lambda *args: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        export_columnar.export(source, dest, "csv")
+    monkeypatch.undo()
+    write_snapshot(source, "2026-10-16_12-05-00", {"a": "UNHEALTHY"})
+
+    assert export_columnar.export(source, dest, "csv") == (2, 2)
+
+    assert [row[2] for row in exported_rows(dest)] == ["HEALTHY", "UNHEALTHY"]
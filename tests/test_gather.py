@@ -0,0 +1,67 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import lambda_function
+from lambda_function import StreamingProber
+
+
+def registration(i):
+    return json.dumps(
+        {
+            "componentName": f"svc-{i}",
+            "healthCheckUrl": f"http://svc-{i}.example/health",
+            "landingPageUrl": f"http://svc-{i}.example/",
+        }
+    )
+
+
+@pytest.fixture
+def components(ssm, cognito, monkeypatch):
+    ssm.parameters.update(
+        {f"/unity/p/v/component/svc-{i}": registration(i) for i in range(25)}
+    )
+    ssm.parameters["/unity/shared-services/component/shared"] = registration("shared")
+
+    def fake_probe_service(ssm_key, service_info, headers, coalescer=None):
+        return {"ssmKey": ssm_key, "token": headers["Authorization"]}
+
+    monkeypatch.setattr(lambda_function, "probe_service", fake_probe_service)
+    return ssm
+
+
+@pytest.mark.parametrize("discovery_mode", ["describe", "path"])
+def test_unordered_prober_gets_every_registration_without_them_being_kept(
+    components, discovery_mode, monkeypatch
+):
+    monkeypatch.setattr(lambda_function, "SSM_DISCOVERY_MODE", discovery_mode)
+    with ThreadPoolExecutor(4) as executor:
+        prober = StreamingProber(executor, ordered=False)
+        results = lambda_function.gather_health_info("p", "v", prober)
+        prober.close()
+        entries = list(prober.iter_completed())
+
+    assert results["shared_components"] == 1
+    assert results["local_components"] == 25
+    assert "shared_services_health_info" not in results
+    assert "local_health_info" not in results
+    assert sorted(entry["ssmKey"] for entry in entries) == sorted(
+        name for name in components.parameters if "/component/" in name
+    )
+    assert {entry["token"] for entry in entries} == {f"Bearer {results['token']}"}
+
+
+def test_ordered_prober_keeps_registrations_for_collect(components):
+    with ThreadPoolExecutor(4) as executor:
+        prober = StreamingProber(executor)
+        results = lambda_function.gather_health_info("p", "v", prober)
+        health_status = prober.collect(
+            [
+                ("shared", results["shared_services_health_info"]),
+                ("local", results["local_health_info"]),
+            ]
+        )
+
+    assert results["local_components"] == len(results["local_health_info"]) == 25
+    assert len(health_status["services"]) == 26
@@ -0,0 +1,219 @@
+import json
+import os
+import threading
+import time
+
+import pytest
+
+import fake_aws
+import lambda_function
+from conftest import BUCKET
+from lambda_function import (
+    CHECK_WINDOW_OBJECT,
+    LATENCY_HISTOGRAM_OBJECT,
+    UPTIME_STATE_OBJECT,
+)
+
+STATE_OBJECTS = {LATENCY_HISTOGRAM_OBJECT, UPTIME_STATE_OBJECT, CHECK_WINDOW_OBJECT}
+
+
+class SlowStateS3Client(fake_aws.FakeS3Client):
+    """
+    Takes a while to answer reads of the per-component state and records how
+    many of them overlapped.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.state_reads = 0
+        self.max_state_reads = 0
+
+    def get_object(self, Bucket, Key, **kwargs):
+        if Key not in STATE_OBJECTS:
+            return super().get_object(Bucket, Key, **kwargs)
+        with self.lock:
+            self.state_reads += 1
+            self.max_state_reads = max(self.max_state_reads, self.state_reads)
+        time.sleep(0.2)
+        with self.lock:
+            self.state_reads -= 1
+        return super().get_object(Bucket, Key, **kwargs)
+
+
+@pytest.fixture
+def cold_start(ssm, cognito, monkeypatch):
+    monkeypatch.setenv("PROJECT", "p")
+    monkeypatch.setenv("VENUE", "v")
+    for state in ("_latency_histograms", "_uptime_rollups", "_check_windows"):
+        monkeypatch.setattr(lambda_function, state, None)
+    s3 = SlowStateS3Client()
+    region = os.environ.get("AWS_REGION") or os.environ.get("AWS_DEFAULT_REGION")
+    monkeypatch.setitem(lambda_function._aws_clients, ("s3", region), s3)
+    return s3
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_state_is_read_concurrently_on_a_cold_start(
+    cold_start, streaming, monkeypatch, capsys
+):
+    monkeypatch.setattr(lambda_function, "REPORT_STREAMING", streaming)
+
+    response = lambda_function.lambda_handler({}, None)
+
+    assert response["statusCode"] == 200
+    assert cold_start.max_state_reads == 3
+    # Every state object was written back
+    assert STATE_OBJECTS <= {key for _, key in cold_start.objects}
+
+
+def test_state_denied_on_a_fresh_deployment_is_read_again(
+    cold_start, tmp_path, monkeypatch, capsys
+):
+    monkeypatch.setattr(lambda_function, "HEALTH_HISTORY", True)
+    monkeypatch.setattr(lambda_function, "HISTORY_DIR", str(tmp_path))
+    monkeypatch.setattr(lambda_function, "_history_writers", {})
+    # Without s3:ListBucket, S3 reports a missing key as AccessDenied
+    cold_start.errors["GetObject"] = ["AccessDenied"] * 4
+
+    response = lambda_function.lambda_handler({}, None)
+
+    assert response["statusCode"] == 200
+    written = {key for _, key in cold_start.objects}
+    assert not STATE_OBJECTS & written
+    assert not any(key.startswith(lambda_function.HISTORY_PREFIX) for key in written)
+
+    # Nothing was taken for empty state, and the next run reads it again
+    response = lambda_function.lambda_handler({}, None)
+
+    assert response["statusCode"] == 200
+    written = {key for _, key in cold_start.objects}
+    assert STATE_OBJECTS <= written
+    assert any(key.startswith(lambda_function.HISTORY_PREFIX) for key in written)
+    assert cold_start.calls["GetObject"] == 8
+
+
+@pytest.fixture
+def skip_unchanged(cold_start, ssm, tmp_path, monkeypatch):
+    """
+    Runs with REPORT_SKIP_UNCHANGED and one component whose probe returns
+    the status in the returned list; records the keys of every PutObject.
+    """
+    monkeypatch.setattr(lambda_function, "REPORT_SKIP_UNCHANGED", True)
+    monkeypatch.setattr(
+        lambda_function, "REPORT_STATE_FILE", str(tmp_path / "report_state.json")
+    )
+    monkeypatch.setattr(lambda_function, "_report_state", None)
+    monkeypatch.setattr(lambda_function, "_report_state_loaded", False)
+    ssm.parameters["/unity/p/v/component/svc"] = json.dumps(
+        {"componentName": "svc", "healthCheckUrl": "http://svc.example/health"}
+    )
+    status = ["HEALTHY", 200]
+    monkeypatch.setattr(
+        lambda_function, "probe_endpoint", lambda info, headers: tuple(status)
+    )
+    cold_start.puts = []
+    put_object = cold_start.put_object
+
+    def record_put(Bucket, Key, Body, **kwargs):
+        cold_start.puts.append(Key)
+        return put_object(Bucket=Bucket, Key=Key, Body=Body, **kwargs)
+
+    monkeypatch.setattr(cold_start, "put_object", record_put)
+    return status
+
+
+def report_writes(s3):
+    # Snapshot and latest-report uploads, leaving out state, history and heartbeat
+    keys = [key for key in s3.puts if key.startswith("health_check_2")]
+    return keys, s3.calls.get("CopyObject", 0)
+
+
+def heartbeat(s3):
+    body, _ = s3.objects[(BUCKET, lambda_function.REPORT_HEARTBEAT_KEY)]
+    return json.loads(body)
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_unchanged_run_writes_only_the_heartbeat(
+    skip_unchanged, cold_start, streaming, monkeypatch, capsys
+):
+    monkeypatch.setattr(lambda_function, "REPORT_STREAMING", streaming)
+    lambda_function.lambda_handler({}, None)
+    (snapshot,), copies = report_writes(cold_start)
+    cold_start.puts.clear()
+
+    lambda_function.lambda_handler({}, None)
+
+    assert report_writes(cold_start) == ([], copies)
+    assert lambda_function.REPORT_HEARTBEAT_KEY in cold_start.puts
+    assert heartbeat(cold_start)["report"] == snapshot
+    assert heartbeat(cold_start)["snapshotUploaded"] is False
+
+
+def test_status_change_uploads_a_snapshot(skip_unchanged, cold_start, capsys):
+    lambda_function.lambda_handler({}, None)
+    cold_start.puts.clear()
+    skip_unchanged[:] = ["UNHEALTHY", 503]
+
+    lambda_function.lambda_handler({}, None)
+
+    assert len(report_writes(cold_start)[0]) == 1
+    assert heartbeat(cold_start)["snapshotUploaded"] is True
+
+
+def test_old_snapshot_is_uploaded_again(
+    skip_unchanged, cold_start, monkeypatch, capsys
+):
+    monkeypatch.setattr(lambda_function, "REPORT_SNAPSHOT_MAX_AGE_SECONDS", 0)
+    lambda_function.lambda_handler({}, None)
+    cold_start.puts.clear()
+
+    lambda_function.lambda_handler({}, None)
+
+    assert len(report_writes(cold_start)[0]) == 1
+    assert heartbeat(cold_start)["snapshotUploaded"] is True
+
+
+class Context:
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def get_remaining_time_in_millis(self):
+        return int(self.seconds * 1000)
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_run_past_the_deadline_uploads_what_it_has(
+    cold_start, ssm, streaming, monkeypatch, capsys
+):
+    monkeypatch.setattr(lambda_function, "REPORT_STREAMING", streaming)
+    monkeypatch.setattr(lambda_function, "DEADLINE_RESERVE_SECONDS", 0)
+    ssm.parameters["/unity/p/v/component/svc"] = json.dumps(
+        {"componentName": "svc", "healthCheckUrl": "http://svc.example/health"}
+    )
+    # Cognito and one state read hang until the test ends
+    release = threading.Event()
+
+    def hang(value):
+        release.wait(10)
+        return value
+
+    monkeypatch.setattr(
+        lambda_function, "create_cognito_client", lambda info: hang("token")
+    )
+    monkeypatch.setattr(
+        lambda_function, "load_uptime_rollups", lambda bucket: hang(None)
+    )
+    try:
+        start = time.monotonic()
+        response = lambda_function.lambda_handler({}, Context(0.5))
+        elapsed = time.monotonic() - start
+    finally:
+        release.set()
+
+    assert response["statusCode"] == 200
+    assert elapsed < 2
+    body, _ = cold_start.objects[(BUCKET, lambda_function.LATEST_REPORT_KEY)]
+    (entry,) = json.loads(body)["services"]
+    assert entry["componentName"] == "svc"
+    assert entry["healthChecks"][0]["status"] == "TIMEOUT"
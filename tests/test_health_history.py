@@ -0,0 +1,46 @@
+import datetime
+
+import lambda_function
+from conftest import BUCKET
+from lambda_function import HealthHistoryWriter
+
+NOW = datetime.datetime(2026, 10, 16, 7, 30)
+
+
+def entry(name):
+    check = {"date": NOW.isoformat(), "status": "HEALTHY", "httpResponseCode": 200}
+    return {"ssmKey": f"/k/{name}", "componentName": name, "healthChecks": [check]}
+
+
+def run(writer, *names):
+    writer.start_run(NOW)
+    for name in names:
+        writer.write(entry(name))
+    writer.finish_run()
+
+
+def uploaded_lines(s3, writer):
+    body, _ = s3.objects[(BUCKET, writer._key(writer.segment_name))]
+    return body.decode().splitlines()
+
+
+def test_every_run_is_uploaded_by_default(s3, tmp_path):
+    writer = HealthHistoryWriter(BUCKET, directory=str(tmp_path))
+
+    run(writer, "a")
+    run(writer, "b")
+
+    assert len(uploaded_lines(s3, writer)) == 2
+
+
+def test_first_run_after_a_cold_start_is_uploaded_with_a_flush_interval(
+    s3, tmp_path, monkeypatch
+):
+    monkeypatch.setattr(lambda_function, "HISTORY_FLUSH_SECONDS", 900)
+    writer = HealthHistoryWriter(BUCKET, directory=str(tmp_path))
+
+    run(writer, "a")
+    run(writer, "b")
+
+    # The second run waits for the interval
+    assert len(uploaded_lines(s3, writer)) == 1
@@ -0,0 +1,77 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import lambda_function
+
+
+class ShortKeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Idle keep-alive connections are closed after this many seconds
+    timeout = 0.2
+
+    def do_GET(self):
+        self.server.requests += 1
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, format, *args):
+        pass
+
+
+class CountingServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), ShortKeepAliveHandler)
+        self.accepted = 0
+        self.requests = 0
+
+    def get_request(self):
+        self.accepted += 1
+        return super().get_request()
+
+
+@pytest.fixture
+def server():
+    server = CountingServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def stats_delta(before):
+    after = lambda_function.get_http_connection_stats()
+    return {name: after[name] - before[name] for name in after}
+
+
+def test_back_to_back_requests_reuse_the_connection(server):
+    url = f"http://127.0.0.1:{server.server_address[1]}/health"
+    session = lambda_function.get_http_session()
+    before = lambda_function.get_http_connection_stats()
+
+    for _ in range(3):
+        session.get(url).close()
+
+    assert server.accepted == 1
+    assert stats_delta(before) == {"requests": 3, "opened": 1, "reused": 2}
+
+
+def test_reconnects_after_the_server_closed_the_connection_count_as_opened(server):
+    url = f"http://127.0.0.1:{server.server_address[1]}/health"
+    session = lambda_function.get_http_session()
+    before = lambda_function.get_http_connection_stats()
+
+    for _ in range(3):
+        session.get(url).close()
+        # Longer than the server's keep-alive timeout
+        time.sleep(0.5)
+
+    assert server.accepted == 3
+    assert stats_delta(before) == {"requests": 3, "opened": 3, "reused": 0}
@@ -0,0 +1,73 @@
+import json
+
+import pytest
+
+import lambda_function
+from conftest import BUCKET
+from lambda_function import LatencyHistogram
+
+
+@pytest.fixture(autouse=True)
+def cold_start(monkeypatch):
+    monkeypatch.setattr(lambda_function, "_latency_histograms", None)
+
+
+def entry(name, latency_ms, status="HEALTHY", code="200"):
+    check = {"status": status, "httpResponseCode": code, "latencyMs": latency_ms}
+    return {"componentName": name, "healthChecks": [check]}
+
+
+def test_percentiles_are_bucket_upper_bounds_within_relative_error():
+    histogram = LatencyHistogram(sub_buckets=8)
+    for value in range(1, 1001):
+        histogram.record(float(value))
+
+    assert histogram.count == 1000
+    assert histogram.percentile(100) == 1000.0
+    for percent, exact in ((50, 500), (90, 900), (99, 990)):
+        assert exact <= histogram.percentile(percent) <= exact * (1 + 1 / 8)
+
+
+def test_round_trip_keeps_counts():
+    histogram = LatencyHistogram(sub_buckets=8)
+    for value in (0.5, 3.0, 42.0, 42.5, 900.0):
+        histogram.record(value)
+
+    restored = LatencyHistogram.from_dict(
+        json.loads(json.dumps(histogram.to_dict())), sub_buckets=8
+    )
+
+    assert restored.counts == histogram.counts
+    assert restored.percentile(50) == histogram.percentile(50)
+
+
+def test_failed_probes_are_not_recorded():
+    histograms = {"windowStart": "2024-01-01T00:00:00", "components": {}}
+
+    lambda_function.record_latency(histograms, entry("a", 5000.0, "UNHEALTHY", "N/A"))
+    lambda_function.record_latency(histograms, entry("a", 12.0))
+
+    assert histograms["components"]["a"].count == 1
+
+
+def test_window_is_restored_from_s3(s3):
+    histograms = lambda_function.load_latency_histograms(BUCKET)
+    lambda_function.record_latency(histograms, entry("a", 12.0))
+    assert lambda_function.upload_latency_histograms(histograms, BUCKET)[0]
+    lambda_function._latency_histograms = None
+
+    restored = lambda_function.load_latency_histograms(BUCKET)
+
+    assert restored["components"]["a"].count == 1
+
+
+def test_failed_read_is_not_taken_for_an_empty_window(s3):
+    histograms = lambda_function.load_latency_histograms(BUCKET)
+    lambda_function.record_latency(histograms, entry("a", 12.0))
+    lambda_function.upload_latency_histograms(histograms, BUCKET)
+    lambda_function._latency_histograms = None
+    s3.errors["GetObject"] = ["SlowDown"]
+
+    assert lambda_function.load_latency_histograms(BUCKET) is None
+    # The next invocation reads the stored window again
+    assert lambda_function.load_latency_histograms(BUCKET)["components"]["a"].count == 1
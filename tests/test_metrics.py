@@ -0,0 +1,112 @@
+import json
+
+import lambda_function
+from lambda_function import EMF_MAX_METRICS, EMF_MAX_VALUES, InvocationMetrics
+
+DIMENSIONS = {"Project": "p", "Venue": "v"}
+
+
+def emitted(metrics, capsys):
+    metrics.emit(DIMENSIONS)
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+
+def metric_names(document):
+    return [m["Name"] for m in document["_aws"]["CloudWatchMetrics"][0]["Metrics"]]
+
+
+def test_emit_prints_one_emf_line(capsys):
+    metrics = InvocationMetrics()
+    metrics.add("UploadTime", 12.3456)
+    metrics.add("ProbeCount", 3, "Count")
+
+    (document,) = emitted(metrics, capsys)
+
+    directive = document["_aws"]["CloudWatchMetrics"][0]
+    assert directive["Namespace"] == lambda_function.METRICS_NAMESPACE
+    assert directive["Dimensions"] == [["Project", "Venue"]]
+    assert directive["Metrics"] == [
+        {"Name": "UploadTime", "Unit": "Milliseconds"},
+        {"Name": "ProbeCount", "Unit": "Count"},
+    ]
+    assert document["Project"] == "p"
+    assert document["Venue"] == "v"
+    assert document["UploadTime"] == 12.346
+    assert document["ProbeCount"] == 3
+
+
+def test_repeated_metric_is_a_value_array(capsys):
+    metrics = InvocationMetrics()
+    for latency in (1.0, 2.0, 3.0):
+        metrics.add("ProbeLatency", latency)
+
+    (document,) = emitted(metrics, capsys)
+
+    assert document["ProbeLatency"] == [1.0, 2.0, 3.0]
+
+
+def test_metrics_over_the_limit_are_split_across_documents(capsys):
+    metrics = InvocationMetrics()
+    for i in range(EMF_MAX_METRICS + 1):
+        metrics.add(f"Metric{i}", i, "Count")
+
+    documents = emitted(metrics, capsys)
+
+    assert [len(metric_names(d)) for d in documents] == [EMF_MAX_METRICS, 1]
+    assert metric_names(documents[1]) == [f"Metric{EMF_MAX_METRICS}"]
+    for document in documents:
+        assert document["Project"] == "p"
+        for name in metric_names(document):
+            assert name in document
+
+
+def test_values_over_the_limit_are_split_across_documents(capsys):
+    metrics = InvocationMetrics()
+    for i in range(EMF_MAX_VALUES * 2 + 1):
+        metrics.add("ProbeLatency", float(i))
+    metrics.add("UploadTime", 5.0)
+
+    documents = emitted(metrics, capsys)
+
+    assert len(documents) == 3
+    assert documents[0]["ProbeLatency"] == [float(i) for i in range(EMF_MAX_VALUES)]
+    assert documents[0]["UploadTime"] == 5.0
+    assert len(documents[1]["ProbeLatency"]) == EMF_MAX_VALUES
+    # A single remaining value is written as a scalar
+    assert documents[2]["ProbeLatency"] == float(EMF_MAX_VALUES * 2)
+    assert metric_names(documents[2]) == ["ProbeLatency"]
+
+
+def test_span_records_wall_time(capsys, monkeypatch):
+    clock = iter([10.0, 10.25])
+    monkeypatch.setattr(lambda_function.time, "perf_counter", lambda: next(clock))
+    metrics = InvocationMetrics()
+
+    with metrics.span("Upload"):
+        pass
+    monkeypatch.undo()
+
+    (document,) = emitted(metrics, capsys)
+    assert document["UploadTime"] == 250.0
+    assert metric_names(document) == ["UploadTime"]
+
+
+def test_span_records_when_the_block_raises():
+    metrics = InvocationMetrics()
+
+    try:
+        with metrics.span("Probing"):
+            raise RuntimeError("probe failed")
+    except RuntimeError:
+        pass
+
+    (document,) = metrics.emf_documents(DIMENSIONS)
+    assert "ProbingTime" in document
+
+
+def test_reset_drops_recorded_values(capsys):
+    metrics = InvocationMetrics()
+    metrics.add("UploadTime", 1.0)
+    metrics.reset()
+
+    assert emitted(metrics, capsys) == []
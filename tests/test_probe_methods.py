@@ -0,0 +1,85 @@
+import json
+import socket
+import time
+
+import pytest
+from stub_http import StubServer
+
+import lambda_function
+from lambda_function import _probe_outcome, parse_service_info, probe_endpoint
+
+HEADERS = {"Authorization": "Bearer token"}
+
+
+@pytest.fixture
+def server():
+    # 64 KiB sent in 1 KiB chunks 20 ms apart, so reading it all takes over a second
+    server = StubServer(0, body=b"x" * 65536, chunk_size=1024, chunk_delay=0.02)
+    server.start()
+    yield server
+    server.stop()
+
+
+def info(url, method, **fields):
+    return parse_service_info(
+        json.dumps({"healthCheckUrl": url, "probeMethod": method, **fields})
+    )
+
+
+def test_head_sends_no_get(server):
+    outcome = _probe_outcome(info(f"{server.base_url}/health", "HEAD"), HEADERS)
+
+    assert outcome[:2] == ("HEALTHY", 200)
+    assert server.methods == {"HEAD": 1}
+    assert outcome[3]["total"] < 500
+
+
+def test_stream_reads_only_up_to_the_byte_cap(server):
+    start = time.perf_counter()
+    status = probe_endpoint(
+        info(f"{server.base_url}/health", "STREAM", probeMaxBytes=1024), HEADERS
+    )
+
+    assert status == ("HEALTHY", 200)
+    assert server.methods == {"GET": 1}
+    assert time.perf_counter() - start < 0.5
+
+
+def test_tcp_only_opens_a_connection(server):
+    status, code, _, timings = _probe_outcome(
+        info(f"{server.base_url}/health", "TCP"), HEADERS
+    )
+
+    assert (status, code) == ("HEALTHY", "N/A")
+    assert not server.methods
+    assert {"dns", "connect", "total"} <= set(timings)
+    assert timings["connect"] <= timings["total"]
+
+
+def test_tcp_to_a_closed_port_is_unhealthy():
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    port = listener.getsockname()[1]
+    listener.close()
+
+    status, code, _, _ = _probe_outcome(
+        info(f"http://127.0.0.1:{port}/health", "TCP"), HEADERS
+    )
+
+    assert (status, code) == ("UNHEALTHY", "N/A")
+
+
+def test_unknown_method_falls_back_to_get(server, monkeypatch):
+    warnings = []
+    monkeypatch.setattr(
+        lambda_function.logger, "warning", lambda *args: warnings.append(args)
+    )
+    # GET reads the whole body
+    server.body = b'{"status": "ok"}'
+    server.chunk_size = len(server.body)
+
+    outcome = _probe_outcome(info(f"{server.base_url}/health", "PING"), HEADERS)
+
+    assert outcome[:2] == ("HEALTHY", 200)
+    assert server.methods == {"GET": 1}
+    assert warnings[0][1] == "PING"
@@ -0,0 +1,108 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import lambda_function
+from lambda_function import StreamingProber
+
+
+def registrations(count):
+    return {
+        f"/unity/p/v/component/svc-{i}": json.dumps(
+            {
+                "componentName": f"svc-{i}",
+                "healthCheckUrl": f"http://svc-{i}.example/health",
+                "landingPageUrl": f"http://svc-{i}.example/",
+            }
+        )
+        for i in range(count)
+    }
+
+
+def fake_probe_service(delays):
+    def probe_service(ssm_key, service_info, headers, coalescer=None):
+        time.sleep(delays.get(ssm_key, 0.05))
+        return {"ssmKey": ssm_key, "healthChecks": [{"status": "HEALTHY"}]}
+
+    return probe_service
+
+
+def test_check_service_health_probes_concurrently_in_order(monkeypatch):
+    service_infos = registrations(8)
+    monkeypatch.setattr(lambda_function, "probe_service", fake_probe_service({}))
+
+    start = time.perf_counter()
+    health_status = lambda_function.check_service_health(
+        service_infos, "token", max_workers=8
+    )
+
+    assert time.perf_counter() - start < 0.3
+    assert [entry["ssmKey"] for entry in health_status["services"]] == list(
+        service_infos
+    )
+
+
+def test_check_service_health_records_probes_past_the_deadline_as_timeout(
+    monkeypatch,
+):
+    service_infos = registrations(3)
+    slow = "/unity/p/v/component/svc-1"
+    monkeypatch.setattr(
+        lambda_function, "probe_service", fake_probe_service({slow: 2.0})
+    )
+
+    start = time.perf_counter()
+    health_status = lambda_function.check_service_health(
+        service_infos, "token", deadline=time.monotonic() + 0.3
+    )
+
+    assert time.perf_counter() - start < 1.0
+    statuses = [
+        entry["healthChecks"][0]["status"] for entry in health_status["services"]
+    ]
+    assert statuses == ["HEALTHY", "TIMEOUT", "HEALTHY"]
+
+
+def test_collect_submits_registrations_not_added_beforehand_together(monkeypatch):
+    service_infos = registrations(8)
+    monkeypatch.setattr(lambda_function, "probe_service", fake_probe_service({}))
+
+    with ThreadPoolExecutor(8) as executor:
+        prober = StreamingProber(executor)
+        prober.set_access_token("token")
+        start = time.perf_counter()
+        health_status = prober.collect([("local", service_infos)])
+        elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.3
+    assert len(health_status["services"]) == 8
+
+
+def test_unordered_add_waits_while_the_queue_is_full(monkeypatch):
+    service_infos = registrations(12)
+    monkeypatch.setattr(lambda_function, "probe_service", fake_probe_service({}))
+    queued = []
+
+    with ThreadPoolExecutor(2) as executor:
+        prober = StreamingProber(executor, ordered=False, max_in_flight=2)
+        prober.set_access_token("token")
+
+        def add_all():
+            # As the SSM fetch does, one batch per page
+            for ssm_key, service_info in service_infos.items():
+                prober.add("local", {ssm_key: service_info})
+                queued.append(len(prober._waiting))
+            prober.close()
+
+        adder = threading.Thread(target=add_all)
+        adder.start()
+        entries = []
+        for entry in prober.iter_completed(time.monotonic() + 5):
+            # A slow reader
+            time.sleep(0.02)
+            entries.append(entry)
+        adder.join()
+
+    assert len(entries) == 12
+    assert max(queued) <= 2
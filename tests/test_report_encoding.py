@@ -0,0 +1,46 @@
+import gzip
+import json
+
+import pytest
+
+import lambda_function
+from lambda_function import encode_report
+
+REPORT = {
+    "services": [
+        {
+            "componentName": "svc",
+            "healthChecks": [{"status": "HEALTHY", "httpResponseCode": "200"}],
+        }
+    ]
+}
+
+
+def test_default_report_is_indented_and_uncompressed(monkeypatch):
+    monkeypatch.setattr(lambda_function, "REPORT_COMPACT", False)
+    monkeypatch.setattr(lambda_function, "REPORT_GZIP", False)
+
+    body, content_encoding = encode_report(REPORT)
+
+    assert content_encoding is None
+    assert body == json.dumps(REPORT, indent=4).encode()
+
+
+@pytest.mark.parametrize("serializer", ["auto", "json"])
+def test_compact_report_has_no_whitespace(serializer):
+    body, _ = encode_report(REPORT, compact=True, compress=False, serializer=serializer)
+
+    assert json.loads(body) == REPORT
+    assert b" " not in body and b"\n" not in body
+
+
+def test_gzip_report_is_reproducible(monkeypatch):
+    monkeypatch.setattr(lambda_function, "REPORT_GZIP", True)
+
+    body, content_encoding = encode_report(REPORT, compact=True)
+
+    assert content_encoding == "gzip"
+    assert json.loads(gzip.decompress(body)) == REPORT
+    # No timestamp in the gzip header, so equal reports compress identically
+    assert encode_report(REPORT, compact=True) == (body, "gzip")
+    assert len(body) < len(encode_report(REPORT, compact=False, compress=True)[0])
@@ -0,0 +1,46 @@
+import io
+
+import pytest
+
+import lambda_function
+from conftest import BUCKET
+from lambda_function import LATEST_REPORT_KEY, upload_report_to_s3
+
+KEY = "health_check_2026-10-16_07-30-00.json"
+BODY = b'{"services": []}'
+
+
+@pytest.fixture(autouse=True)
+def copy_mode(monkeypatch):
+    monkeypatch.setattr(lambda_function, "REPORT_LATEST_MODE", "copy")
+
+
+def test_latest_report_is_copied(s3):
+    assert upload_report_to_s3(BODY, BUCKET, KEY, "gzip")[0]
+
+    assert s3.calls == {"PutObject": 1, "CopyObject": 1}
+    assert s3.objects[(BUCKET, LATEST_REPORT_KEY)] == s3.objects[(BUCKET, KEY)]
+
+
+@pytest.mark.parametrize("body", [BODY, io.BytesIO(BODY)], ids=["bytes", "file"])
+def test_failed_copy_uploads_the_latest_report_instead(s3, body):
+    s3.errors["CopyObject"] = ["AccessDenied"]
+
+    status, message = upload_report_to_s3(body, BUCKET, KEY, "gzip")
+
+    assert status, message
+    assert s3.calls == {"PutObject": 2, "CopyObject": 1}
+    latest, metadata = s3.objects[(BUCKET, LATEST_REPORT_KEY)]
+    # A file body is rewound before the second upload
+    assert latest == BODY
+    assert metadata["ContentEncoding"] == "gzip"
+
+
+def test_failed_report_upload_is_not_copied(s3):
+    s3.errors["PutObject"] = ["SlowDown"]
+
+    status, message = upload_report_to_s3(BODY, BUCKET, KEY)
+
+    assert not status
+    assert "SlowDown" in message
+    assert "CopyObject" not in s3.calls
@@ -0,0 +1,108 @@
+import json
+import os
+import stat
+import time
+
+import pytest
+
+import lambda_function
+from lambda_function import invalidate_ssm_cache, ssm_cache_get, ssm_cache_put
+
+
+@pytest.fixture
+def cache_file(tmp_path, monkeypatch):
+    path = tmp_path / "ssm_cache.json"
+    monkeypatch.setattr(lambda_function, "SSM_CACHE_TTL_SECONDS", 60)
+    monkeypatch.setattr(lambda_function, "SSM_CACHE_FILE", str(path))
+    monkeypatch.setattr(lambda_function, "_ssm_cache", {})
+    monkeypatch.setattr(lambda_function, "_ssm_cache_loaded", False)
+    return path
+
+
+def cold_start(monkeypatch):
+    monkeypatch.setattr(lambda_function, "_ssm_cache", {})
+    monkeypatch.setattr(lambda_function, "_ssm_cache_loaded", False)
+
+
+def test_entries_expire_after_the_ttl(cache_file, monkeypatch):
+    ssm_cache_put({"value:/a": ["/a", "1"]})
+    assert ssm_cache_get("value:/a") == ["/a", "1"]
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+
+    assert ssm_cache_get("value:/a") is None
+
+
+def test_cache_is_off_without_a_ttl(cache_file, monkeypatch):
+    monkeypatch.setattr(lambda_function, "SSM_CACHE_TTL_SECONDS", 0)
+
+    ssm_cache_put({"value:/a": ["/a", "1"]})
+
+    assert ssm_cache_get("value:/a") is None
+    assert not cache_file.exists()
+
+
+def test_cache_survives_a_cold_start_in_a_private_file(cache_file, monkeypatch):
+    ssm_cache_put({"names:/unity/p/v/component/": ["/unity/p/v/component/a"]})
+    cold_start(monkeypatch)
+
+    assert ssm_cache_get("names:/unity/p/v/component/") == ["/unity/p/v/component/a"]
+    assert stat.S_IMODE(os.stat(cache_file).st_mode) == 0o600
+
+
+def test_unreadable_file_starts_an_empty_cache(cache_file):
+    cache_file.write_text("{not json")
+
+    assert ssm_cache_get("value:/a") is None
+    ssm_cache_put({"value:/a": ["/a", "1"]})
+    assert json.loads(cache_file.read_text())["value:/a"][1] == ["/a", "1"]
+
+
+def test_invalidate_drops_only_matching_names(cache_file, monkeypatch):
+    ssm_cache_put(
+        {
+            "value:/unity/p/v/component/a": ["/unity/p/v/component/a", "1"],
+            "names:/unity/p/v/component/": ["/unity/p/v/component/a"],
+            "value:/unity/shared-services/aws/account": "123456789012",
+        }
+    )
+
+    invalidate_ssm_cache("/unity/p/v/")
+    cold_start(monkeypatch)
+
+    assert ssm_cache_get("value:/unity/p/v/component/a") is None
+    assert ssm_cache_get("names:/unity/p/v/component/") is None
+    assert ssm_cache_get("value:/unity/shared-services/aws/account") == "123456789012"
+
+
+def test_invalidate_event_finds_new_components(
+    cache_file, ssm, cognito, s3, monkeypatch, capsys
+):
+    monkeypatch.setenv("PROJECT", "p")
+    monkeypatch.setenv("VENUE", "v")
+    for feature in ("LATENCY_HISTOGRAMS", "UPTIME_ROLLUPS", "HEALTH_HISTORY"):
+        monkeypatch.setattr(lambda_function, feature, False)
+    monkeypatch.setattr(lambda_function, "CHECK_WINDOW_SIZE", 1)
+    monkeypatch.setattr(lambda_function, "_check_windows", None)
+    monkeypatch.setattr(
+        lambda_function, "probe_endpoint", lambda info, headers: ("HEALTHY", 200)
+    )
+
+    def register(name):
+        ssm.parameters[f"/unity/p/v/component/{name}"] = json.dumps(
+            {"componentName": name, "healthCheckUrl": f"http://{name}.example/"}
+        )
+
+    def components(event):
+        response = lambda_function.lambda_handler(event, None)
+        services = json.loads(response["body"])["services"]
+        return sorted(entry["componentName"] for entry in services)
+
+    register("a")
+    assert components({}) == ["a"]
+    register("b")
+
+    # Registrations are served from the cache until it is invalidated
+    assert components({}) == ["a"]
+    assert components({"invalidateSsmCache": True}) == ["a", "b"]
@@ -0,0 +1,23 @@
+import lambda_function
+
+
+def test_throttled_chunk_is_called_at_most_retries_plus_one_times(ssm, monkeypatch):
+    ssm.parameters["/unity/p/v/component/a"] = "{}"
+    ssm.throttle_rate = 1.0
+    monkeypatch.setattr(lambda_function, "SSM_THROTTLE_RETRIES", 2)
+    monkeypatch.setattr(lambda_function, "SSM_THROTTLE_BASE_DELAY", 0.001)
+
+    values = lambda_function.get_ssm_parameter_value(["/unity/p/v/component/a"])
+
+    assert values == {}
+    assert ssm.calls["GetParameters"] == 3
+
+
+def test_chunks_are_merged_in_request_order(ssm):
+    names = [f"/unity/p/v/component/svc-{i:02}" for i in range(25)]
+    ssm.parameters.update({name: name.upper() for name in names})
+
+    values = lambda_function.get_ssm_parameter_value(names, max_workers=4)
+
+    assert list(values) == names
+    assert ssm.calls["GetParameters"] == 3
@@ -0,0 +1,95 @@
+import datetime
+import json
+
+import pytest
+
+import lambda_function
+from conftest import BUCKET
+from lambda_function import UptimeRollup
+
+NOW = datetime.datetime(2024, 5, 10, 12, 30)
+
+
+@pytest.fixture(autouse=True)
+def cold_start(monkeypatch):
+    monkeypatch.setattr(lambda_function, "_uptime_rollups", None)
+
+
+def at(**delta):
+    return (NOW - datetime.timedelta(**delta)).isoformat()
+
+
+def entry(name, status):
+    # Uploads prune relative to the current time
+    date = datetime.datetime.now().isoformat()
+    check = {"status": status, "httpResponseCode": "200", "date": date}
+    return {"componentName": name, "healthChecks": [check]}
+
+
+def test_windows_count_checks_by_age():
+    rollup = UptimeRollup()
+    rollup.record(at(days=20), "UNHEALTHY")
+    rollup.record(at(days=3), "HEALTHY")
+    rollup.record(at(hours=5), "TIMEOUT")
+    rollup.record(at(minutes=10), "HEALTHY")
+
+    summary = rollup.summary(NOW)["windows"]
+
+    assert summary["1h"]["total"] == 1
+    assert summary["24h"]["TIMEOUT"] == 1
+    assert summary["24h"]["total"] == 2
+    assert summary["7d"]["total"] == 3
+    assert summary["30d"]["UNHEALTHY"] == 1
+    assert summary["30d"]["availability"] == 0.5
+
+
+def test_streak_and_last_change():
+    rollup = UptimeRollup()
+    rollup.record(at(minutes=20), "HEALTHY")
+    rollup.record(at(minutes=15), "UNHEALTHY")
+    rollup.record(at(minutes=10), "UNHEALTHY")
+
+    summary = rollup.summary(NOW)
+
+    assert summary["streak"] == {
+        "status": "UNHEALTHY",
+        "count": 2,
+        "since": at(minutes=15),
+    }
+    assert summary["lastChange"] == {
+        "date": at(minutes=15),
+        "from": "HEALTHY",
+        "to": "UNHEALTHY",
+    }
+
+
+def test_prune_drops_data_outside_every_window():
+    rollup = UptimeRollup()
+    rollup.record(at(days=31), "HEALTHY")
+
+    assert not rollup.prune(NOW)
+
+
+def test_rollups_are_restored_from_s3(s3):
+    rollups = lambda_function.load_uptime_rollups(BUCKET)
+    lambda_function.record_uptime(rollups, entry("a", "HEALTHY"))
+    assert lambda_function.upload_uptime_rollups(rollups, BUCKET)[0]
+    lambda_function._uptime_rollups = None
+
+    restored = lambda_function.load_uptime_rollups(BUCKET)
+
+    assert restored["a"].streak["count"] == 1
+    summary = json.loads(s3.objects[(BUCKET, lambda_function.UPTIME_OBJECT)][0])
+    assert summary["components"]["a"]["windows"]["1h"]["HEALTHY"] == 1
+
+
+def test_failed_read_does_not_overwrite_stored_counts(s3):
+    rollups = lambda_function.load_uptime_rollups(BUCKET)
+    for _ in range(3):
+        lambda_function.record_uptime(rollups, entry("a", "HEALTHY"))
+    lambda_function.upload_uptime_rollups(rollups, BUCKET)
+    lambda_function._uptime_rollups = None
+    s3.errors["GetObject"] = ["SlowDown"]
+
+    assert lambda_function.load_uptime_rollups(BUCKET) is None
+    assert lambda_function.load_uptime_rollups(BUCKET)["a"].streak["count"] == 3
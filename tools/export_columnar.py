@@ -0,0 +1,188 @@
+"""
+Export health check snapshots to date-partitioned columnar files.
+
+Reads the health_check_<timestamp>.json reports the lambda uploads, from a
+local directory standing in for the bucket (e.g. filled with aws s3 sync),
+and writes one row per check with the columns service, category, type,
+status, code, latency and timestamp. Rows are written under
+<dest>/date=YYYY-MM-DD/, one part file per date per export, so engines such
+as DuckDB, Athena or pandas can prune by date. Snapshots are read in date
+order and each date's part file is written as soon as that date is done, so
+memory is bounded by one date (one row group for Parquet), not the export.
+
+The export is incremental: <dest>/_watermark.json records the last snapshot
+exported, advanced after every date, and later runs only read newer
+snapshots. A part file is named after its first snapshot, so an export
+interrupted before advancing the watermark rewrites the same file when run
+again rather than adding a duplicate. Parquet output needs pyarrow; --format
+csv writes gzipped CSV with the standard library instead.
+
+Usage: python tools/export_columnar.py SOURCE DEST [--format parquet|csv]
+"""
+
+import argparse
+import csv
+import datetime
+import gzip
+import importlib.util
+import itertools
+import json
+import os
+import re
+
+SNAPSHOT_PATTERN = re.compile(
+    r"^health_check_(\d{4}-\d{2}-\d{2})_\d{2}-\d{2}-\d{2}\.json$"
+)
+WATERMARK_FILE = "_watermark.json"
+PARQUET_ROW_GROUP_ROWS = 65536
+COLUMNS = ("service", "category", "type", "status", "code", "latency", "timestamp")
+
+
+def read_snapshot(path):
+    """
+    Return the services of a snapshot, decompressing reports uploaded with REPORT_GZIP.
+    """
+    with open(path, "rb") as f:
+        body = f.read()
+    if body[:2] == b"\x1f\x8b":
+        body = gzip.decompress(body)
+    return json.loads(body)["services"]
+
+
+def snapshot_rows(services):
+    """
+    Yield one row per service in a snapshot, from its newest check.
+
+    Older checks a snapshot may carry were exported with earlier snapshots.
+    """
+    for entry in services:
+        check = entry["healthChecks"][0]
+        yield {
+            "service": entry["componentName"],
+            "category": entry["componentCategory"],
+            "type": entry["componentType"],
+            "status": check["status"],
+            "code": check["httpResponseCode"],
+            "latency": check.get("latencyMs"),
+            "timestamp": datetime.datetime.fromisoformat(check["date"]),
+        }
+
+
+def new_snapshots(source, watermark):
+    """
+    Return (name, date) of the snapshots in source newer than watermark, oldest first.
+    """
+    snapshots = []
+    for name in os.listdir(source):
+        match = SNAPSHOT_PATTERN.match(name)
+        # Timestamped names sort chronologically
+        if match and (watermark is None or name > watermark):
+            snapshots.append((name, match.group(1)))
+    return sorted(snapshots)
+
+
+def write_parquet(rows, path):
+    """
+    Write rows to a Parquet file in row groups of PARQUET_ROW_GROUP_ROWS and return how many were written.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema(
+        [
+            ("service", pa.string()),
+            ("category", pa.string()),
+            ("type", pa.string()),
+            ("status", pa.string()),
+            ("code", pa.string()),
+            ("latency", pa.float64()),
+            ("timestamp", pa.timestamp("us")),
+        ]
+    )
+    rows = iter(rows)
+    count = 0
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        while True:
+            batch = list(itertools.islice(rows, PARQUET_ROW_GROUP_ROWS))
+            if not batch:
+                break
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            count += len(batch)
+    return count
+
+
+def write_csv(rows, path):
+    """
+    Write rows to a gzipped CSV file and return how many were written.
+    """
+    count = 0
+    with gzip.open(path, "wt", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({**row, "timestamp": row["timestamp"].isoformat()})
+            count += 1
+    return count
+
+
+WRITERS = {"parquet": (write_parquet, ".parquet"), "csv": (write_csv, ".csv.gz")}
+
+
+def export(source, dest, output_format="parquet"):
+    """
+    Export snapshots newer than the watermark and return the number of snapshots and rows written.
+
+    Parameters:
+    - source (str): Directory holding health_check_<timestamp>.json snapshots.
+    - dest (str): Output directory for the date partitions and the watermark.
+    - output_format (str): "parquet" or "csv".
+    """
+    write, extension = WRITERS[output_format]
+    watermark_path = os.path.join(dest, WATERMARK_FILE)
+    watermark = None
+    if os.path.exists(watermark_path):
+        with open(watermark_path) as f:
+            watermark = json.load(f)["lastSnapshot"]
+
+    snapshots = new_snapshots(source, watermark)
+    snapshot_count = row_count = 0
+    # Snapshots are sorted, so each date's are consecutive
+    for date, group in itertools.groupby(snapshots, key=lambda snapshot: snapshot[1]):
+        names = [name for name, _ in group]
+        rows = (
+            row
+            for name in names
+            for row in snapshot_rows(read_snapshot(os.path.join(source, name)))
+        )
+        partition = os.path.join(dest, f"date={date}")
+        os.makedirs(partition, exist_ok=True)
+        path = os.path.join(partition, f"part-{names[0][len('health_check_'):-5]}")
+        path += extension
+        row_count += write(rows, path + ".tmp")
+        os.replace(path + ".tmp", path)
+        snapshot_count += len(names)
+
+        # Only advance the watermark once the date's part file is in place
+        with open(watermark_path + ".tmp", "w") as f:
+            json.dump({"lastSnapshot": names[-1]}, f)
+        os.replace(watermark_path + ".tmp", watermark_path)
+    return snapshot_count, row_count
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("source", help="directory holding the snapshot objects")
+    parser.add_argument("dest", help="output directory")
+    parser.add_argument("--format", choices=sorted(WRITERS), default="parquet")
+    args = parser.parse_args()
+    if args.format == "parquet" and importlib.util.find_spec("pyarrow") is None:
+        parser.error("Parquet output needs pyarrow; install it or use --format csv")
+
+    snapshot_count, row_count = export(args.source, args.dest, args.format)
+    print(f"Exported {snapshot_count} snapshots, {row_count} rows to {args.dest}")
+
+
+if __name__ == "__main__":
+    main()